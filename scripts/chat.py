@@ -2,30 +2,35 @@
 
 import sys
 import os
+import re
 import logging
 from pathlib import Path
 import shutil
 import json
+import functools
 
 import textwrap
+
+import numpy as np
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 from config import load_config
 from storage import Storage
-from embedder import Embedder
 from cli import print_help
 from llm import get_llm, LLMError
 from prompts import load_prompt
 from retriever import search_chunks
 
 
-logging.basicConfig(
-    filename='chat.log',
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(message)s'
-)
-
 METADATA_FILE = 'metadata.json'
 INDEX_FILES = ['chunks.jsonl', 'embeddings.npy', METADATA_FILE, 'wiki_state.json']
+# Prebuilt vector indexes, synced when present so the chat does not have to
+# rebuild them from embeddings.npy on startup, and the wiki_state.json delta
+# log, without which the cached wiki_state.json is an older snapshot
+OPTIONAL_INDEX_FILES = ['faiss.index', 'faiss.index.hash', 'chunks.idx', 'embeddings_int8.npy', 'embeddings_scales.npy',
+                        'wiki_state.delta.jsonl']
+OPTIONAL_INDEX_DIRS = ['chroma_db']
+# stat of the network metadata.json at the last sync, kept in the cache
+SYNC_STAMP_FILE = 'last_sync.json'
 
 
 def load_json(path):
@@ -36,25 +41,172 @@ def load_json(path):
         return {}
 
 
+# sentence boundary used by the extractive fallback answer
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+# update_index writes 'version' as the first key of metadata.json
+_VERSION_RE = re.compile(rb'"version"\s*:\s*"([^"]*)"')
+
+
+def read_index_version(path):
+    """Return the `version` field of a metadata.json, or None.
+
+    Only the head of the file is read; the full JSON parse is a fallback
+    for files where the key is not found there.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4096)
+    except OSError:
+        return None
+    match = _VERSION_RE.search(head)
+    if match:
+        return match.group(1).decode('utf-8')
+    return load_json(path).get('version')
+
+
+# Buffer size for copies that cannot use sendfile (Windows, SMB mounts)
+COPY_BUFSIZE = 1024 * 1024
+
+
+def _copy_contents(fsrc, fdst):
+    """Copy an open binary file into another, in-kernel where possible."""
+    if hasattr(os, 'sendfile'):
+        try:
+            size = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            if offset == size:
+                return
+        except OSError:
+            pass
+        # start over with the buffered copy
+        fsrc.seek(0)
+        fdst.seek(0)
+        fdst.truncate()
+    shutil.copyfileobj(fsrc, fdst, length=COPY_BUFSIZE)
+
+
+def copy_index_file(src, dst):
+    """Copy `src` over `dst` via a temporary file and an atomic rename.
+
+    The running chat memory-maps `embeddings.npy`; truncating and rewriting
+    the mapped file in place would crash the reader, while a rename leaves
+    the old file intact until its mapping is released.
+    """
+    tmp = dst.with_name(dst.name + '.tmp')
+    with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+        _copy_contents(fsrc, fdst)
+    shutil.copystat(src, tmp)
+    os.replace(tmp, dst)
+
+
+def copy_index_dir(src, dst):
+    """Replace the directory `dst` with a copy of `src`.
+
+    The copy is made next to `dst` first so an interrupted sync never
+    leaves a half-written collection in place.
+    """
+    tmp = dst.with_name(dst.name + '.tmp')
+    old = dst.with_name(dst.name + '.old')
+    for stale in (tmp, old):
+        if stale.exists():
+            shutil.rmtree(stale)
+    shutil.copytree(src, tmp)
+    if dst.exists():
+        os.replace(dst, old)
+    os.replace(tmp, dst)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def is_same_file(src, dst):
+    """True when `dst` has the same size and mtime as `src`.
+
+    copy2 preserves mtimes, so files that did not change since the last
+    sync compare equal and need not be copied again.
+    """
+    try:
+        src_stat = src.stat()
+        dst_stat = dst.stat()
+    except OSError:
+        return False
+    return (src_stat.st_size == dst_stat.st_size
+            and abs(src_stat.st_mtime - dst_stat.st_mtime) < 1)
+
+
+def read_sync_stamp(path):
+    """Return the network metadata stat recorded by the last sync, or {}."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_sync_stamp(path, net_stat, version):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({
+            'net_mtime': net_stat.st_mtime,
+            'net_size': net_stat.st_size,
+            'version': version,
+        }, f)
+    os.replace(tmp, path)
+
+
 def sync_local_cache(config):
     network_path = Path(config['storage']['network_drive']) / 'current'
     cache_path = Path(config['storage']['local_cache'])
     cache_path.mkdir(parents=True, exist_ok=True)
     net_meta = network_path / METADATA_FILE
     cache_meta = cache_path / METADATA_FILE
-    net_info = load_json(net_meta)
-    cache_info = load_json(cache_meta)
-    if net_info.get('version') != cache_info.get('version'):
+    stamp_path = cache_path / SYNC_STAMP_FILE
+    # a single stat of the network metadata decides the common case; the
+    # metadata is only read when it changed since the last sync
+    try:
+        net_stat = os.stat(net_meta)
+    except OSError:
+        net_stat = None
+    stamp = read_sync_stamp(stamp_path)
+    if (net_stat is not None
+            and stamp.get('net_mtime') == net_stat.st_mtime
+            and stamp.get('net_size') == net_stat.st_size
+            and all((cache_path / fname).exists() for fname in INDEX_FILES)):
+        print("Using cached index.")
+        return
+    net_version = read_index_version(net_meta)
+    if net_version != read_index_version(cache_meta):
         msg = "New index version detected, syncing local cache..."
         print(msg)
         for fname in INDEX_FILES:
+            src = network_path / fname
+            dst = cache_path / fname
+            if src.exists() and not is_same_file(src, dst):
+                copy_index_file(src, dst)
+        for fname in OPTIONAL_INDEX_FILES:
             src = network_path / fname
             dst = cache_path / fname
             if src.exists():
-                shutil.copy2(src, dst)
+                if not is_same_file(src, dst):
+                    copy_index_file(src, dst)
+            elif dst.exists():
+                # never keep an index built from a previous version
+                dst.unlink()
+        for dname in OPTIONAL_INDEX_DIRS:
+            src = network_path / dname
+            dst = cache_path / dname
+            if src.is_dir():
+                copy_index_dir(src, dst)
+            elif dst.exists():
+                shutil.rmtree(dst)
         print("Local cache updated.")
     else:
         print("Using cached index.")
+    if net_stat is not None:
+        write_sync_stamp(stamp_path, net_stat, net_version)
 
 
 def print_metadata(config):
@@ -74,6 +226,51 @@ def print_config(retrieval):
     print(f"  similarity_threshold: {retrieval.get('similarity_threshold', 0.3)}")
     print("Type 'top_k <value>' or 'threshold <value>' to change, or just press Enter to keep.")
 
+def shorten_snippet(text, width=800, placeholder='...'):
+    """Equivalent of `textwrap.shorten` that only looks at the head of `text`.
+
+    textwrap tokenizes the whole string even though at most `width`
+    characters survive; chunk texts can be much longer than that.
+    """
+    head = text[:2 * width]
+    collapsed = ' '.join(head.split())
+    if len(head) < len(text) and len(collapsed) <= width:
+        # mostly whitespace: the head alone cannot decide the result
+        return textwrap.shorten(text, width=width, placeholder=placeholder)
+    if len(collapsed) <= width:
+        return collapsed
+    cut = collapsed.rfind(' ', 0, width - len(placeholder) + 1)
+    if cut <= 0:
+        return placeholder.lstrip()
+    return collapsed[:cut] + placeholder
+
+
+def project_results(results):
+    """Return `(page, url, text)` rows for the ranked `(chunk, score)` results.
+
+    Sources and the LLM context read the same few fields; pulling them out
+    once keeps the dict lookups to one pass over the top-k hits.
+    """
+    rows = []
+    for chunk, _ in results:
+        get = chunk.get
+        rows.append((get('page_title') or get('page', ''), get('url', ''), get('text', '')))
+    return rows
+
+
+def build_context_parts(rows, max_chars=3000):
+    """Build a compact LLM context from projected rows as a list of parts."""
+    parts = []
+    chars = 0
+    for page, _, text in rows:
+        part = f"Quelle: {page}\n{text}\n"
+        if chars + len(part) > max_chars:
+            break
+        parts.append(part)
+        chars += len(part)
+    return parts
+
+
 def synthesize_answer(results):
     """
     Given `results` as a list of (chunk, score) tuples, synthesize a short,
@@ -88,7 +285,7 @@ def synthesize_answer(results):
         text = chunk.get('text', '')
         url = chunk.get('url', '')
         # truncate to keep prompts reasonably small
-        snippet = textwrap.shorten(text.replace('\n', ' '), width=800, placeholder='...')
+        snippet = shorten_snippet(text.replace('\n', ' '), width=800, placeholder='...')
         entries.append({'page': page, 'section': section, 'text': snippet, 'url': url, 'score': score})
 
     # Offline extractive summarizer: combine top snippets and produce a
@@ -99,8 +296,7 @@ def synthesize_answer(results):
     # Combine the top 2 snippets to increase coverage
     combined = ' '.join(e['text'] for e in entries[:2])
     # Simple sentence split (works adequately for short snippets)
-    import re
-    sentences = re.split(r'(?<=[.!?])\s+', combined)
+    sentences = _SENT_SPLIT.split(combined)
     answer_sentences = [s.strip() for s in sentences if s.strip()][:2]
     answer = ' '.join(answer_sentences)
     if not answer:
@@ -115,13 +311,59 @@ def synthesize_answer(results):
     return answer_with_source, sources
 
 
+def stream_answer(llm, llm_kwargs):
+    """Print the answer of `llm` while it is generated and return its text.
+
+    A failure before the first piece is raised so the caller can fall back
+    to the extractive answer; after it, the partial answer is kept and
+    marked as incomplete.
+    """
+    pieces = []
+    try:
+        for piece in llm.generate_from_chunks_stream(**llm_kwargs):
+            if not pieces:
+                print("\nAntwort:")
+            pieces.append(piece)
+            print(piece, end='', flush=True)
+    except Exception as e:
+        if not pieces:
+            raise
+        print(f"\n[Antwort unvollständig: {e}]", end='')
+    if pieces:
+        print()
+    return ''.join(pieces)
+
+
+def setup_logging():
+    """Log to chat.log unless the root logger is already configured.
+
+    Called from main() rather than at import time so that importing this
+    module (tests, other scripts) never opens a second handler on the log.
+    """
+    if logging.getLogger().handlers:
+        return
+    logging.basicConfig(
+        filename='chat.log',
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+
+
 def main():
+    setup_logging()
     try:
         config = load_config()
         sync_local_cache(config)
-        storage = Storage(config['storage']['local_cache'])
-        # Instantiate LLM and require it to be available when enabled
-        llm = get_llm(config)
+        storage = Storage(
+            config['storage']['local_cache'],
+            faiss_index=config.get('retrieval', {}).get('faiss_index', 'flat'),
+            device=config.get('retrieval', {}).get('device', 'cpu'),
+        )
+        # parse chunks only when a search returns them
+        lazy_chunks = config['storage'].get('lazy_chunks', False)
+        # Start loading the LLM in the background while the index loads;
+        # availability problems are reported on the first question
+        llm = get_llm(config, validate=False, preload=True)
     except Exception as e:
         print(f"[Fatal Error] Startup failed: {e}")
         return
@@ -168,6 +410,7 @@ def main():
         "/info   - Show index metadata",
         "/config - View/change search parameters",
         "/refresh- Reload index from disk",
+        "/multi  - Search several questions at once (separate with |)",
         "/update - Trigger full index rebuild",
         "/quit   - Exit chat"
     ]
@@ -190,7 +433,7 @@ def main():
         # Progress indicator for index loading
         try:
             print("Loading index...")
-            chunks = storage.load_chunks()
+            chunks = storage.load_chunks(lazy=lazy_chunks)
             embeddings = storage.load_embeddings()
         except Exception as e:
             print(f"[Error] Failed to load index: {e}")
@@ -208,8 +451,30 @@ def main():
         backend = 'brute-force (numpy)'
     print(f"Vector backend: {backend}")
     # ...existing code...
-    embedder = Embedder(config['models']['embedding'])
-    # LLM is required (if enabled) and was initialized at startup
+    # The embedding model is loaded on the first question, so commands like
+    # /info or /update do not pay for it
+    embedder = None
+
+    def get_embedder():
+        nonlocal embedder
+        if embedder is None:
+            # importing embedder pulls in sentence-transformers and torch
+            from embedder import Embedder
+            embedder = Embedder(config['models']['embedding'])
+        return embedder
+
+    # Repeated questions skip the embedding model entirely. The cached
+    # vectors are shared between calls, so they are made read-only.
+    @functools.lru_cache(maxsize=256)
+    def embed_query(text):
+        vec = np.asarray(get_embedder().embed([text])[0], dtype=np.float32)
+        vec.setflags(write=False)
+        return vec
+
+    # let the LLM answer near-duplicate questions from its cache
+    if llm is not None and hasattr(llm, 'embed_fn'):
+        llm.embed_fn = embed_query
+
     chunks = storage.chunks if hasattr(storage, 'chunks') else None
     embeddings = storage.embeddings if hasattr(storage, 'embeddings') else None
     retrieval = config.get('retrieval', {})
@@ -267,18 +532,47 @@ def main():
             if cmd == '/refresh':
                 try:
                     print("Refreshing local cache from network and reloading index...")
+                    # release the mapped index so the sync can replace it
+                    embeddings = None
+                    storage.close()
                     try:
                         sync_local_cache(config)
                     except Exception as e:
                         print(f"[Warning] Sync failed: {e}")
-                    chunks = storage.load_chunks()
+                    chunks = storage.load_chunks(lazy=lazy_chunks)
                     embeddings = storage.load_embeddings()
+                    # cached answers were generated from the old index
+                    if getattr(llm, 'cache', None) is not None:
+                        llm.cache.clear()
                     print("Index reloaded from disk.")
                 except Exception as e:
                     print(f"[Error] Failed to reload index: {e}")
                 # Reload chunks and embeddings after refresh
                 # variables already updated above
                 continue
+            if cmd.startswith('/multi'):
+                questions = [q.strip() for q in cmd[len('/multi'):].split('|') if q.strip()]
+                if not questions:
+                    print("Usage: /multi <question> | <question> | ...")
+                    continue
+                if chunks is None or embeddings is None:
+                    print("No index loaded. Please run /update and /refresh.")
+                    continue
+                try:
+                    # embed all questions in one call and score them against
+                    # the index with a single matrix product
+                    query_vecs = get_embedder().embed(questions)
+                    batch = storage.search_batch(query_vecs, top_k=top_k, threshold=similarity_threshold)
+                    for question, results in zip(questions, batch):
+                        print(f"\nFrage: {question}")
+                        if not results:
+                            print("  No relevant results found.")
+                        for chunk, score in results:
+                            page = chunk.get('page_title') or chunk.get('page', 'Unknown')
+                            print(f"  [{score:.3f}] {page}")
+                except Exception as e:
+                    print(f"[Error] Query failed: {e}")
+                continue
             if cmd == '/config':
                 retrieval = config.get('retrieval', {})
                 print_config(retrieval)
@@ -310,7 +604,7 @@ def main():
                 continue
             try:
                 # Embed user query and run retrieval using helper
-                query_vec = embedder.embed([cmd])[0]
+                query_vec = embed_query(cmd)
                 # Prefer storage-backed search (may use FAISS) when available
                 if hasattr(storage, 'search'):
                     results = storage.search(
@@ -329,24 +623,13 @@ def main():
                     continue
                 # If an LLM is configured, build context and ask it to generate
                 answer_text = None
-                sources = [(r[0].get('page_title') or r[0].get('page', 'Unknown'), r[0].get('url', '')) for r in results]
+                # set once the answer has been printed while it streamed in
+                streamed = False
+                rows = project_results(results)
+                sources = [(page or 'Unknown', url) for page, url, _ in rows]
                 if llm is not None:
                     try:
-                        # Build a compact context from top results as a list of parts
-                        def build_context_parts(results_list, max_chars=3000):
-                            parts = []
-                            chars = 0
-                            for chunk, score in results_list:
-                                text = chunk.get('text', '')
-                                meta = chunk.get('page_title') or chunk.get('page', '')
-                                part = f"Quelle: {meta}\n{text}\n"
-                                if chars + len(part) > max_chars:
-                                    break
-                                parts.append(part)
-                                chars += len(part)
-                            return parts
-
-                        context_parts = build_context_parts(results)
+                        context_parts = build_context_parts(rows)
                         prompt_path = config.get('models', {}).get('llm', {}).get('prompt_template_path', 'prompts/german_default.txt')
                         try:
                             template = load_prompt(prompt_path)
@@ -356,13 +639,19 @@ def main():
                         if not template:
                             template = "{context}\n\nFrage: {question}\n\nAntwort:"
 
-                        answer_text = llm.generate_from_chunks(
+                        llm_kwargs = dict(
                             chunks=context_parts,
                             prompt_template=template,
                             question=cmd,
                             max_tokens=config.get('models', {}).get('llm', {}).get('max_tokens', 512),
                             temperature=config.get('models', {}).get('llm', {}).get('temperature', 0.0),
                         )
+                        if hasattr(llm, 'generate_from_chunks_stream'):
+                            # print the answer as it is generated
+                            answer_text = stream_answer(llm, llm_kwargs)
+                            streamed = bool(answer_text)
+                        else:
+                            answer_text = llm.generate_from_chunks(**llm_kwargs)
                     except LLMError as e:
                         print(f"[Warning] LLM generation failed: {e}. Falling back to extractive answer.")
                         answer_text = None
@@ -373,8 +662,9 @@ def main():
                 # Synthesize a short human-readable answer from the retrieved contexts (fallback)
                 if not answer_text:
                     answer_text, _ = synthesize_answer(results)
-                print("\nAntwort:")
-                print(answer_text)
+                if not streamed:
+                    print("\nAntwort:")
+                    print(answer_text)
                 if sources:
                     # Print up to 5 sources that have URLs
                     urls_present = [url for _, url in sources[:5] if url]
@@ -10,8 +10,9 @@ import sys
 import os
 from pathlib import Path
 import argparse
-import json
 import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from storage import Storage
 
 
 def main():
@@ -26,8 +27,8 @@ def main():
         print('chunks.jsonl or embeddings.npy not found in source path')
         return
 
-    chunks = [json.loads(line) for line in open(chunks_path, 'r', encoding='utf-8')]
-    embs = np.load(str(emb_path))
+    chunks = Storage(src).load_chunks(chunks_path)
+    embs = np.load(str(emb_path), mmap_mode='r', allow_pickle=False)
 
     try:
         from vectorstore_chroma import ChromaVectorStore
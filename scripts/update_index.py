@@ -21,28 +21,262 @@ import argparse
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from config import load_config
-from storage import Storage
+from storage import Storage, embeddings_fingerprint
 from fetcher import MediaWikiFetcher
-from chunker import chunk_text
-from embedder import Embedder
+from chunker import chunk_text, chunk_id
 import shutil
+import functools
+from concurrent.futures import ProcessPoolExecutor
 import datetime
+import hashlib
+import json
+
+import numpy as np
+try:
+    # optional C JSON codec for chunks.jsonl; stdlib json otherwise
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    # optional SIMD/multi-threaded hash for the staging integrity check
+    import blake3
+except ImportError:
+    blake3 = None
 
 logging.basicConfig(filename='update_index.log', level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
 
+# dtypes embeddings.npy may be written in (storage.embedding_dtype)
+EMBEDDING_DTYPES = ('float32', 'float16')
+
+
+# The staging check only guards against truncated writes, so it uses the
+# fastest available hash rather than a cryptographic one
+CHECKSUM_ALGORITHM = 'blake3' if blake3 is not None else 'blake2b'
+
+
+def file_checksum(path):
+    """Hex digest of the file at `path` (see CHECKSUM_ALGORITHM), or None."""
+    try:
+        if blake3 is not None:
+            # memory-maps the file and hashes it on all cores
+            return blake3.blake3(max_threads=blake3.blake3.AUTO).update_mmap(path).hexdigest()
+        with open(path, 'rb') as f:
+            # Python 3.11+ runs the whole read+hash loop in C
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'blake2b').hexdigest()
+            h = hashlib.blake2b()
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+    except Exception:
+        return None
+
+
+# below this many changed pages, starting worker processes costs more than
+# cleaning and chunking in-process
+PARALLEL_MIN_PAGES = 64
+
+# parallel page-content requests; each one carries maxlag and backs off on a
+# maxlag error or HTTP 429 (honouring Retry-After), so a busy wiki slows the
+# workers down instead of being flooded
+FETCH_WORKERS = 8
+
+
+def clean_and_chunk(page, chunk_size, overlap):
+    """Clean the raw wikitext of `page` and split it into chunks."""
+    page = dict(page, content=MediaWikiFetcher.clean_content(page.get('content', '')))
+    return chunk_text(page, chunk_size=chunk_size, overlap=overlap)
+
+
+def chunk_pages(pages, chunk_size, overlap, workers=None):
+    """Clean and chunk `pages`, in worker processes when there are many.
+
+    Returns the chunks of all pages in page order. `workers` defaults to
+    the number of CPUs; 1 disables the process pool.
+    """
+    work = functools.partial(clean_and_chunk, chunk_size=chunk_size, overlap=overlap)
+    if workers == 1 or len(pages) < PARALLEL_MIN_PAGES:
+        results = map(work, pages)
+        return [chunk for chunks in results for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(work, pages, chunksize=32)
+        return [chunk for chunks in results for chunk in chunks]
+
+
+def load_previous_embeddings(index_path, n_chunks, model_name):
+    """Memory-map the embeddings of the index at `index_path`.
+
+    Rows are only reusable when they were produced by the same embedding
+    model and line up with the `n_chunks` previous chunks; otherwise None
+    is returned. Memory-mapping means only reused rows are read.
+    """
+    try:
+        with open(index_path / 'metadata.json', 'r', encoding='utf-8') as f:
+            prev_meta = json.load(f)
+        if prev_meta.get('model_name') != model_name:
+            return None
+        prev_embs = np.load(index_path / 'embeddings.npy', mmap_mode='r', allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if prev_embs.ndim != 2 or len(prev_embs) != n_chunks:
+        return None
+    return prev_embs
+
+
+def content_hash(content):
+    """Hash of a page's raw wikitext, stored in wiki_state per page."""
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def diff_pages(pages, prev_pages, contents=None, full_rebuild=False):
+    """Compare the listed `pages` with the previous wiki state.
+
+    `contents` maps title -> page with content for the pages fetched after
+    listing (None when `pages` already carry their content). Returns the
+    new state entries by title and the pages that need to be chunked
+    again; a page whose new revision has the same content hash as before
+    keeps its chunks.
+    """
+    state_pages = {}
+    changed_pages = []
+    for page in pages:
+        title = page['title']
+        prev = prev_pages.get(title)
+        changed = full_rebuild or not prev or prev.get("revid") != page.get('revid')
+        if changed and contents is not None:
+            page = contents.get(title)
+            if page is None:
+                # deleted after it was listed; the next run sees it again
+                continue
+        entry = {"revid": page.get('revid'), "timestamp": page.get('timestamp')}
+        if 'content' in page:
+            entry["content_hash"] = content_hash(page['content'])
+        elif prev and prev.get("content_hash"):
+            entry["content_hash"] = prev["content_hash"]
+        state_pages[title] = entry
+        if not changed:
+            continue
+        # a new revision with identical text keeps its chunks
+        if (not full_rebuild and prev and entry.get("content_hash")
+                and prev.get("content_hash") == entry["content_hash"]):
+            continue
+        changed_pages.append(page)
+    return state_pages, changed_pages
+
+
+STATE_FILE = 'wiki_state.json'
+# changes to the snapshot in STATE_FILE, one JSON object per update run
+STATE_DELTA_FILE = 'wiki_state.delta.jsonl'
+
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def load_wiki_state(index_path):
+    """Read the page state: the snapshot with all logged deltas applied."""
+    with open(index_path / STATE_FILE, 'rb') as f:
+        state = json.loads(f.read())
+    pages = state.setdefault('pages', {})
+    delta_path = index_path / STATE_DELTA_FILE
+    if delta_path.exists():
+        loads = orjson.loads if orjson is not None else json.loads
+        with open(delta_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                delta = loads(line)
+                pages.update(delta.get('+', {}))
+                pages.update(delta.get('~', {}))
+                for title in delta.get('-', []):
+                    pages.pop(title, None)
+    return state
+
+
+def write_wiki_state(staging_path, new_state, prev_path, prev_state):
+    """Write `new_state` to staging as the previous snapshot plus a delta.
+
+    The snapshot from `prev_path` is hard-linked (or copied) unchanged and
+    only the pages added, changed or removed since `prev_state` are
+    appended to the delta log. Once the log would outgrow the snapshot, a
+    fresh snapshot is written instead and the log starts over.
+    """
+    new_pages = new_state['pages']
+    prev_pages = prev_state.get('pages', {})
+    delta = {
+        '+': {t: v for t, v in new_pages.items() if t not in prev_pages},
+        '~': {t: v for t, v in new_pages.items() if t in prev_pages and prev_pages[t] != v},
+        '-': [t for t in prev_pages if t not in new_pages],
+    }
+    line = _dumps(delta) + b'\n'
+    prev_snapshot = prev_path / STATE_FILE
+    prev_log = prev_path / STATE_DELTA_FILE
+    try:
+        snapshot_size = prev_snapshot.stat().st_size if prev_pages else 0
+        log_size = prev_log.stat().st_size if prev_log.exists() else 0
+    except OSError:
+        snapshot_size = 0
+    if snapshot_size and log_size + len(line) <= snapshot_size:
+        try:
+            # the snapshot is never modified in place, so sharing it with
+            # the previous index is safe
+            os.link(prev_snapshot, staging_path / STATE_FILE)
+        except OSError:
+            shutil.copyfile(prev_snapshot, staging_path / STATE_FILE)
+        if log_size:
+            # the log is appended to, so it must be a copy
+            shutil.copyfile(prev_log, staging_path / STATE_DELTA_FILE)
+        if any(delta.values()):
+            with open(staging_path / STATE_DELTA_FILE, 'ab') as f:
+                f.write(line)
+    else:
+        with open(staging_path / STATE_FILE, 'wb') as f:
+            f.write(_dumps(new_state))
+
+
+def embed_with_reuse(all_chunks, prev_embs, prev_rows, get_embedder):
+    """Embed `all_chunks`, copying vectors for texts seen in the previous index.
+
+    Only chunks whose content id (`chunk_id` of the text) is not in
+    `prev_rows` are sent to the embedder. Returns `(embeddings, n_reused)`
+    in the order of `all_chunks`.
+    """
+    reuse = {}
+    todo = []
+    for i, chunk in enumerate(all_chunks):
+        row = prev_rows.get(chunk_id(chunk.get('text', '')))
+        if row is None:
+            todo.append(i)
+        else:
+            reuse[i] = row
+    if not reuse:
+        return get_embedder().embed_chunks(all_chunks), 0
+    embeddings = np.empty((len(all_chunks), prev_embs.shape[1]), dtype=np.float32)
+    targets = list(reuse)
+    embeddings[targets] = prev_embs[[reuse[i] for i in targets]]
+    if todo:
+        embeddings[todo] = get_embedder().embed_chunks([all_chunks[i] for i in todo])
+    return embeddings, len(reuse)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Update MediaWiki RAG index.")
     parser.add_argument('--full-rebuild', action='store_true', help='Force full index rebuild')
     args = parser.parse_args()
 
     config = load_config()
+    embedding_dtype = config['storage'].get('embedding_dtype', 'float32')
+    if embedding_dtype not in EMBEDDING_DTYPES:
+        print(f'[Config Error] Unsupported storage.embedding_dtype: {embedding_dtype}')
+        return
     storage = Storage(config['storage']['network_drive'])
     lock_path = Path(config['storage']['network_drive']) / '.update.lock'
     staging_path = Path(config['storage']['network_drive']) / 'staging'
     current_path = Path(config['storage']['network_drive']) / 'current'
     archive_path = Path(config['storage']['network_drive']) / 'archive'
-    import json
     try:
         try:
             storage.acquire_lock(lock_path)
@@ -53,69 +287,118 @@ def main():
             return
 
         wiki_url = config['wiki']['url'] + config['wiki']['api_endpoint']
-        fetcher = MediaWikiFetcher(wiki_url)
-        try:
-            pages = fetcher.fetch_all_pages(max_retries=3, backoff=2, batch_size=50)
-        except Exception as fetch_err:
-            logging.error(f'Fetch error: {fetch_err}')
-            print(f'[Fetch Error] {fetch_err}')
-            storage.release_lock(lock_path)
-            return
-        logging.info(f'Fetched {len(pages)} pages.')
+        # content is cleaned together with chunking, see chunk_pages
+        fetcher = MediaWikiFetcher(wiki_url, clean=False)
 
-        state_path = current_path / 'wiki_state.json'
+        state_path = current_path / STATE_FILE
         if not args.full_rebuild and state_path.exists():
-            with open(state_path, 'r', encoding='utf-8') as f:
-                prev_state = json.load(f)
+            prev_state = load_wiki_state(current_path)
         else:
             prev_state = {"pages": {}}
 
         prev_pages = prev_state.get("pages", {})
         new_state = {"pages": {}}
 
-        changed_pages = []
-        for page in pages:
-            title = page['title']
-            revid = page.get('revid')
-            timestamp = page.get('timestamp')
-            new_state["pages"][title] = {"revid": revid, "timestamp": timestamp}
-            prev = prev_pages.get(title)
-            if args.full_rebuild or not prev or prev.get("revid") != revid:
-                changed_pages.append(page)
+        batch_size = config.get('update', {}).get('batch_size', 50)
+        fetch_workers = config.get('update', {}).get('fetch_workers', FETCH_WORKERS)
+        try:
+            if prev_pages:
+                # incremental: list revisions without content and download
+                # only the pages whose revid differs from the last run
+                pages = fetcher.list_revisions(max_retries=3, backoff=2)
+                stale = [p['title'] for p in pages
+                         if prev_pages.get(p['title'], {}).get('revid') != p['revid']]
+                contents = {p['title']: p for p in fetcher.fetch_pages(
+                    stale, max_retries=3, backoff=2,
+                    batch_size=batch_size, max_workers=fetch_workers)}
+                logging.info(f'Listed {len(pages)} pages, fetched content of {len(contents)} changed pages.')
+            else:
+                pages = fetcher.fetch_all_pages(
+                    max_retries=3, backoff=2,
+                    batch_size=batch_size, max_workers=fetch_workers)
+                contents = None
+                logging.info(f'Fetched {len(pages)} pages.')
+        except Exception as fetch_err:
+            logging.error(f'Fetch error: {fetch_err}')
+            print(f'[Fetch Error] {fetch_err}')
+            storage.release_lock(lock_path)
+            return
+
+        new_state["pages"], changed_pages = diff_pages(
+            pages, prev_pages, contents, full_rebuild=args.full_rebuild)
 
         chunk_size = config['chunking']['target_size']
         overlap = config['chunking']['overlap']
         prev_chunks_path = current_path / 'chunks.jsonl'
-        prev_chunks = []
-        if not args.full_rebuild and prev_chunks_path.exists():
-            with open(prev_chunks_path, 'r', encoding='utf-8') as f:
-                prev_chunks = [json.loads(line) for line in f]
+        changed_titles = {p['title'] for p in changed_pages}
+        new_pages = new_state["pages"]
 
+        # Stream the previous chunks once: keep those of pages that still
+        # exist and did not change, and remember the row of every text so
+        # its embedding can be reused
         all_chunks = []
-        if not args.full_rebuild:
-            unchanged_titles = set(prev_pages.keys()) & set(new_state["pages"].keys())
-            for chunk in prev_chunks:
+        prev_rows = {}
+        n_prev = 0
+        if not args.full_rebuild and prev_chunks_path.exists():
+            for chunk in storage.iter_chunks(prev_chunks_path):
+                prev_rows.setdefault(chunk_id(chunk.get('text', '')), n_prev)
+                n_prev += 1
                 title = chunk.get('page_title')
-                if title in unchanged_titles and title not in [p['title'] for p in changed_pages]:
+                if title in new_pages and title not in changed_titles:
                     all_chunks.append(chunk)
-        for page in changed_pages:
-            chunks = chunk_text(page, chunk_size=chunk_size, overlap=overlap)
-            all_chunks.extend(chunks)
+        all_chunks.extend(chunk_pages(
+            changed_pages, chunk_size, overlap,
+            workers=config.get('update', {}).get('chunk_workers')))
         logging.info(f'Built chunk list with {len(all_chunks)} chunks.')
 
-        embedder = Embedder(config['models']['embedding'])
+        # chunks whose text is unchanged keep their previous vectors; the
+        # model is only loaded if something is left to embed
+        prev_embs = None
+        if prev_rows:
+            prev_embs = load_previous_embeddings(
+                current_path, n_prev, config['models']['embedding'])
+        if prev_embs is None:
+            prev_rows = {}
+        embedder = None
+
+        def get_embedder():
+            nonlocal embedder
+            if embedder is None:
+                # imported here so chunking workers do not load torch
+                from embedder import Embedder
+                embedder = Embedder(
+                    config['models']['embedding'],
+                    batch_size=config['models'].get('embedding_batch_size', 32),
+                )
+            return embedder
+
         try:
-            embeddings = embedder.embed_chunks(all_chunks)
+            embeddings, n_reused = embed_with_reuse(all_chunks, prev_embs, prev_rows, get_embedder)
         except Exception as embed_err:
             logging.error(f'Embedding error: {embed_err}')
             print(f'[Embedding Error] {embed_err}')
             storage.release_lock(lock_path)
             return
-        logging.info(f'Generated embeddings for {len(all_chunks)} chunks.')
+        logging.info(f'Generated embeddings for {len(all_chunks) - n_reused} chunks, '
+                     f'reused {n_reused} from the previous index.')
+        # release the mapping of current/embeddings.npy before the swap
+        prev_embs = prev_rows = None
+        # float16 halves embeddings.npy on the network drive and in the
+        # cache sync; the search side upcasts once when it loads the file
+        embeddings = np.asarray(embeddings).astype(embedding_dtype, copy=False)
 
         try:
+            # staging is moved to current on success; start from an empty
+            # directory so nothing from an earlier failed run is published
+            if staging_path.exists():
+                shutil.rmtree(staging_path)
+            staging_path.mkdir(parents=True)
             storage.save_chunks(all_chunks, staging_path / 'chunks.jsonl')
             storage.save_embeddings(embeddings, staging_path / 'embeddings.npy')
+            if config['storage'].get('int8_search', False):
+                # quarter-size copy that chat searches instead of a
+                # normalized float32 matrix
+                storage.save_embeddings_int8(embeddings, staging_path)
             # Attempt to build and persist a FAISS index in staging so
             # that consumers can load a ready-made index instead of
             # rebuilding from embeddings. This is optional and will
@@ -124,9 +407,13 @@ def main():
                 from vectorstore import FaissVectorStore
 
                 try:
-                    vs = FaissVectorStore(staging_path)
+                    vs = FaissVectorStore(
+                        staging_path,
+                        index_type=config.get('retrieval', {}).get('faiss_index', 'flat'),
+                    )
                     vs.build_index(embeddings)
-                    vs.save()
+                    # lets chat skip rebuilding the index after a sync
+                    vs.save(source_hash=embeddings_fingerprint(staging_path / 'embeddings.npy'))
                     logging.info('FAISS index built and saved to staging.')
                 except Exception as fi_err:
                     logging.info(f'FAISS build/save skipped: {fi_err}')
@@ -147,8 +434,7 @@ def main():
             except Exception:
                 pass
 
-            with open(staging_path / 'wiki_state.json', 'w', encoding='utf-8') as f:
-                json.dump(new_state, f, ensure_ascii=False, indent=2)
+            write_wiki_state(staging_path, new_state, current_path, prev_state)
             # Write metadata.json for versioning and stats
             metadata = {
                 'version': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
@@ -157,6 +443,7 @@ def main():
                 'total_chunks': len(all_chunks),
                 'model_name': config['models'].get('embedding'),
                 'embedding_dim': int(embeddings.shape[1]) if hasattr(embeddings, 'shape') and len(embeddings.shape) > 1 else None,
+                'embedding_dtype': str(embeddings.dtype),
                 'chunk_size': chunk_size,
                 'chunk_overlap': overlap
             }
@@ -170,26 +457,12 @@ def main():
             return
 
         # 5. Validate integrity
-        import hashlib
-        def file_checksum(path):
-            h = hashlib.sha256()
-            try:
-                with open(path, 'rb') as f:
-                    while True:
-                        chunk = f.read(8192)
-                        if not chunk:
-                            break
-                        h.update(chunk)
-                return h.hexdigest()
-            except Exception as e:
-                return None
-
         integrity_report = {}
-        for fname in ['chunks.jsonl', 'embeddings.npy', 'wiki_state.json']:
+        for fname in ['chunks.jsonl', 'embeddings.npy', STATE_FILE]:
             fpath = staging_path / fname
             exists = fpath.exists()
             checksum = file_checksum(fpath) if exists else None
-            integrity_report[fname] = {'exists': exists, 'sha256': checksum}
+            integrity_report[fname] = {'exists': exists, CHECKSUM_ALGORITHM: checksum}
 
         missing = [k for k, v in integrity_report.items() if not v['exists']]
         if missing:
@@ -201,17 +474,24 @@ def main():
 
         try:
             if current_path.exists():
-                timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M')
+                timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
                 archive_ver = archive_path / timestamp
-                shutil.copytree(current_path, archive_ver)
-                shutil.rmtree(current_path)
+                # shutil.move would nest current/ inside an existing directory
+                n = 1
+                while archive_ver.exists():
+                    archive_ver = archive_path / f'{timestamp}_{n}'
+                    n += 1
+                archive_path.mkdir(parents=True, exist_ok=True)
+                # a rename on the same filesystem; shutil.move only copies
+                # when the archive lives on another device
+                shutil.move(str(current_path), str(archive_ver))
                 logging.info(f'Archived previous index to {archive_ver}.')
                 archives = sorted(archive_path.iterdir(), key=lambda p: p.name, reverse=True)
                 for old in archives[2:]:
                     if old.is_dir():
                         shutil.rmtree(old)
                         logging.info(f'Removed old archive {old}.')
-            shutil.copytree(staging_path, current_path)
+            shutil.move(str(staging_path), str(current_path))
             logging.info('Staging swapped to current.')
         except Exception as swap_err:
             logging.error(f'Swap error: {swap_err}')
@@ -6,16 +6,37 @@ to fixed-size slicing when necessary. The function keeps the same public
 signature used by tests and other code.
 """
 
+import hashlib
 import re
 from typing import List, Dict
 
 
+_RE_SENT_END = re.compile(r'[.!?]\s+')
+_RE_PARA = re.compile(r'\n{2,}')
+
+
+def chunk_id(text: str) -> str:
+    """Content-based chunk id: equal texts get equal ids on every run.
+
+    Unlike a title/position id it survives page renames and shifted
+    paragraphs, so unchanged chunks can be recognized across updates.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
 def _split_sentences(text: str) -> List[str]:
     # Simple sentence splitter using punctuation boundaries. Falls back to
     # returning the whole text if no sentence boundaries are found.
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    if len(sentences) <= 1:
+    # Matching the punctuation itself avoids the lookbehind a split on
+    # whitespace would need; the punctuation stays with its sentence.
+    sentences = []
+    prev = 0
+    for m in _RE_SENT_END.finditer(text):
+        sentences.append(text[prev:m.start() + 1])
+        prev = m.end()
+    if not sentences:
         return [text]
+    sentences.append(text[prev:])
     return sentences
 
 
@@ -31,8 +52,8 @@ def chunk_text(page: Dict, chunk_size: int = 800, overlap: int = 150) -> List[Di
     - If sentences are still longer than `chunk_size` (e.g. long unbroken
       text), fall back to fixed-size slicing with `overlap`.
 
-    Returns a list of chunk dicts with keys: `id`, `text`, `page_title`,
-    `chunk_index`, `char_count`.
+    Returns a list of chunk dicts with keys: `id` (see `chunk_id`), `text`,
+    `page_title`, `chunk_index`, `char_count`.
     """
     text = page.get('content', '') or ''
     title = page.get('title', '') or ''
@@ -40,9 +61,12 @@ def chunk_text(page: Dict, chunk_size: int = 800, overlap: int = 150) -> List[Di
     if not text:
         return []
 
-    paragraphs = re.split(r'\n{2,}', text)
+    paragraphs = _RE_PARA.split(text)
     chunks = []
-    current = ''
+    # the chunk being assembled, as pieces joined only when emitted;
+    # `length` is the length of the joined text
+    parts = []
+    length = 0
     idx = 0
 
     def _emit(part: str):
@@ -51,7 +75,7 @@ def chunk_text(page: Dict, chunk_size: int = 800, overlap: int = 150) -> List[Di
         if not part:
             return
         chunk = {
-            'id': f"{title}_chunk{idx:03d}",
+            'id': chunk_id(part),
             'text': part,
             'page_title': title,
             'chunk_index': idx,
@@ -60,6 +84,26 @@ def chunk_text(page: Dict, chunk_size: int = 800, overlap: int = 150) -> List[Di
         chunks.append(chunk)
         idx += 1
 
+    def _add(sep: str, piece: str):
+        # append `piece` to the current chunk, or emit the chunk and start
+        # the next one from its overlap tail when `piece` does not fit
+        nonlocal length
+        if not parts:
+            parts.append(piece)
+            length = len(piece)
+        elif length + len(sep) + len(piece) > chunk_size:
+            current = ''.join(parts)
+            _emit(current)
+            # keep overlap tail; the chunk is stripped, so only its start
+            # can be whitespace
+            tail = current[-overlap:].lstrip() if overlap and len(current) > overlap else ''
+            parts[:] = [tail, sep, piece] if tail else [piece]
+            length = len(tail) + len(sep) + len(piece) if tail else len(piece)
+        else:
+            parts.append(sep)
+            parts.append(piece)
+            length += len(sep) + len(piece)
+
     for para in paragraphs:
         para = para.strip()
         if not para:
@@ -67,34 +111,29 @@ def chunk_text(page: Dict, chunk_size: int = 800, overlap: int = 150) -> List[Di
 
         # If paragraph fits into chunk_size, try to append to current
         if len(para) <= chunk_size:
-            if not current:
-                current = para
-            else:
-                # If joining would exceed size, emit current and start new
-                if len(current) + 2 + len(para) > chunk_size:
-                    # emit current (with overlap preserved for next)
-                    _emit(current)
-                    # keep overlap tail
-                    tail = current[-overlap:] if overlap and len(current) > overlap else ''
-                    current = (tail + '\n\n' + para).strip()
-                else:
-                    current = (current + '\n\n' + para).strip()
+            _add('\n\n', para)
         else:
             # Paragraph too large; split into sentences and attempt to assemble
             sentences = _split_sentences(para)
             # If splitting produced only one long sentence, fallback to slicing
             if len(sentences) == 1 and len(sentences[0]) > chunk_size:
                 # flush current
-                if current:
-                    _emit(current)
-                    current = ''
+                if parts:
+                    _emit(''.join(parts))
+                    parts.clear()
+                    length = 0
                 long_text = sentences[0]
+                # an overlap of chunk_size or more would never advance
+                step = chunk_size - overlap if overlap < chunk_size else chunk_size
                 start = 0
-                while start < len(long_text):
+                while True:
                     end = min(start + chunk_size, len(long_text))
-                    slice_part = long_text[start:end]
-                    _emit(slice_part)
-                    start += chunk_size - overlap
+                    _emit(long_text[start:end])
+                    # stop at the end of the text instead of emitting
+                    # tails that the last window already contains
+                    if end == len(long_text):
+                        break
+                    start += step
                 continue
 
             # assemble chunks from sentences
@@ -102,18 +141,10 @@ def chunk_text(page: Dict, chunk_size: int = 800, overlap: int = 150) -> List[Di
                 s = s.strip()
                 if not s:
                     continue
-                if not current:
-                    current = s
-                else:
-                    if len(current) + 1 + len(s) > chunk_size:
-                        _emit(current)
-                        tail = current[-overlap:] if overlap and len(current) > overlap else ''
-                        current = (tail + ' ' + s).strip()
-                    else:
-                        current = (current + ' ' + s).strip()
+                _add(' ', s)
 
     # emit final buffer
-    if current:
-        _emit(current)
+    if parts:
+        _emit(''.join(parts))
 
     return chunks
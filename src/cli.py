@@ -9,4 +9,5 @@ def print_help():
     print('/info - Index info')
     print('/refresh - Reload index')
     print('/config - Search parameters')
+    print('/multi - Search several questions (q1 | q2)')
     print('/quit - Exit')
@@ -13,17 +13,41 @@ class DownloadError(Exception):
     pass
 
 
+# bytes read from the response per write; large reads keep syscalls and
+# Python overhead low for multi-GB model files
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
 def _sha256_of_file(path: str) -> str:
-    h = hashlib.sha256()
     with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
+        # Python 3.11+ runs the whole read+hash loop in C
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b''):
             h.update(chunk)
     return h.hexdigest()
 
 
-def ensure_model(dest_path: str, url: str, sha256: str = None, download_dir: str = None) -> str:
+def _validator(headers):
+    """Strong validator of a response for If-Range, or None."""
+    etag = headers.get('ETag')
+    # If-Range only accepts strong entity tags
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def ensure_model(dest_path: str, url: str, sha256: str = None, download_dir: str = None,
+                 session: requests.Session = None) -> str:
     """Ensure model file exists at `dest_path`. If not, download from `url`.
 
+    An interrupted download leaves its `.tmp` file behind and the next call
+    resumes it with an HTTP Range request, guarded by If-Range with the
+    ETag or Last-Modified of the first response; without either, only a
+    download with a `sha256` to check is resumed. Pass `session` to reuse
+    an existing connection pool.
+
     Returns the path to the model file on success, or raises DownloadError.
     """
     dest = Path(dest_path)
@@ -43,27 +67,67 @@ def ensure_model(dest_path: str, url: str, sha256: str = None, download_dir: str
             return str(dest)
 
     tmp_path = dest.with_suffix(dest.suffix + '.tmp')
+    # validator of the response the partial file was started from
+    validator_path = tmp_path.with_name(tmp_path.name + '.validator')
+    get = session.get if session is not None else requests.get
     try:
-        with requests.get(url, stream=True, timeout=30) as r:
-            r.raise_for_status()
-            with open(tmp_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-
-        # verify checksum if provided
-        if sha256:
-            if _sha256_of_file(tmp_path) != sha256:
-                tmp_path.unlink(missing_ok=True)
-                raise DownloadError('Checksum mismatch after download')
+        # a second attempt only follows a partial file that was discarded
+        for _ in range(2):
+            offset = tmp_path.stat().st_size if tmp_path.exists() else 0
+            validator = validator_path.read_text() if validator_path.exists() else None
+            # model files are already compressed; ask for the raw bytes so
+            # Range offsets refer to the file itself
+            headers = {'Accept-Encoding': 'identity'}
+            # without a validator only the checksum could tell that the
+            # partial file belongs to the current version
+            if offset and (validator or sha256):
+                headers['Range'] = f'bytes={offset}-'
+                if validator:
+                    # a changed file is sent whole instead of the rest
+                    headers['If-Range'] = validator
+            else:
+                offset = 0
+            with get(url, stream=True, timeout=30, headers=headers) as r:
+                if offset and r.status_code == 416:
+                    # nothing left to fetch; that is only the complete
+                    # file if its checksum says so
+                    if sha256 and _sha256_of_file(tmp_path) == sha256:
+                        break
+                    tmp_path.unlink(missing_ok=True)
+                    validator_path.unlink(missing_ok=True)
+                    continue
+                r.raise_for_status()
+                if offset and r.status_code == 206:
+                    mode = 'ab'
+                else:
+                    # a fresh start, a changed file or a server without
+                    # Range support
+                    mode = 'wb'
+                    validator = _validator(r.headers)
+                    if validator:
+                        validator_path.write_text(validator)
+                    else:
+                        validator_path.unlink(missing_ok=True)
+                with open(tmp_path, mode) as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+            break
+    except Exception as e:
+        # keep the partial file so the next attempt can resume it
+        raise DownloadError(str(e))
+
+    # verify checksum if provided
+    if sha256:
+        if _sha256_of_file(tmp_path) != sha256:
+            tmp_path.unlink(missing_ok=True)
+            validator_path.unlink(missing_ok=True)
+            raise DownloadError('Checksum mismatch after download')
 
-        # atomic move
+    # atomic move
+    try:
         shutil.move(str(tmp_path), str(dest))
-        return str(dest)
     except Exception as e:
-        # cleanup
-        try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
         raise DownloadError(str(e))
+    validator_path.unlink(missing_ok=True)
+    return str(dest)
@@ -7,16 +7,22 @@ import numpy as np
 
 class Embedder:
 
-    def __init__(self, model_name='paraphrase-multilingual-MiniLM-L12-v2'):
+    def __init__(self, model_name='paraphrase-multilingual-MiniLM-L12-v2', batch_size=32):
         self.model = SentenceTransformer(model_name)
+        # texts per forward pass; encode() already groups texts of similar
+        # length, so larger batches add little padding
+        self.batch_size = batch_size
 
     def embed_chunks(self, chunks):
         """
         Accepts a list of chunk dicts, returns numpy array of embeddings.
         """
         texts = [chunk['text'] for chunk in chunks]
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        return np.array(embeddings, dtype=np.float32)
+        # unit-length float32 rows straight from encode(); astype only
+        # copies if the model returned another dtype
+        embeddings = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=True,
+                                       convert_to_numpy=True, normalize_embeddings=True)
+        return embeddings.astype(np.float32, copy=False)
 
     def embed(self, texts):
         """
@@ -29,6 +35,7 @@ class Embedder:
         else:
             single = False
             items = list(texts)
-        embeddings = self.model.encode(items, show_progress_bar=False)
-        arr = np.array(embeddings, dtype=np.float32)
+        embeddings = self.model.encode(items, batch_size=self.batch_size, show_progress_bar=False,
+                                       convert_to_numpy=True, normalize_embeddings=True)
+        arr = embeddings.astype(np.float32, copy=False)
         return arr[0] if single else arr
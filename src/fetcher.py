@@ -1,119 +1,256 @@
 # MediaWiki API fetcher for Wiki RAG
 
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+
+# seconds of replication lag after which the API should refuse our requests
+MAXLAG = 5
+
+# Wiki markup stripped by `MediaWikiFetcher.clean_content`, as one
+# alternation so the page is scanned once. Branches are tried in this order
+# at each position (refs before the generic HTML tag) and keep their own
+# flags: headings are per line, ref/references bodies may span lines.
+_RE_CLEAN = re.compile(
+    r"(?m:^={2,}.*={2,}\s*$)"                           # == Heading ==
+    r"|(?i:\[\[(?:File|Image):[^\[\]]*\]\])"            # [[File:...]]
+    r"|(?is:<ref[^>]*>.*?</ref>)"                       # <ref>...</ref>
+    r"|(?i:<ref[^>]*/>)"                                # <ref />
+    r"|(?is:<references[^>]*>.*?</references>)"         # <references>...</references>
+    r"|(?i:<references[^>]*/>)"                         # <references />
+    r"|<[^>]+>"                                         # any other HTML tag
+    r"|\{\{ ?[Ff]ile:[^}]*\}\}"                         # {{File:...}}
+)
+_RE_BLANK = re.compile(r"\n{2,}")
+
+# revision content of the main slot, as returned by formatversion=2
+REVISION_PARAMS = {
+    'format': 'json',
+    'formatversion': 2,
+    'prop': 'revisions',
+    'rvprop': 'ids|timestamp|content',
+    'rvslots': 'main',
+    'maxlag': MAXLAG,
+}
+
+
+class ThrottledError(Exception):
+    """The API asked us to back off (maxlag error or HTTP 429)."""
+
+    def __init__(self, retry_after=None):
+        super().__init__('MediaWiki API asked to retry later')
+        try:
+            self.retry_after = int(retry_after) if retry_after else None
+        except ValueError:
+            self.retry_after = None
 
 
 class MediaWikiFetcher:
 
-    def __init__(self, api_url):
+    def __init__(self, api_url, clean=True):
         self.api_url = api_url
+        # False returns raw wikitext so callers can run clean_content
+        # themselves, e.g. in worker processes
+        self.clean = clean
 
 
-    def fetch_all_pages(self, max_retries=3, backoff=2, batch_size=50):
+    def fetch_all_pages(self, max_retries=3, backoff=2, batch_size=50, max_workers=1):
         """
-        Fetches all pages from the MediaWiki API using pagination (gapcontinue).
+        Fetches all pages from the MediaWiki API using pagination (continue).
         Returns a list of page dicts with title, content, revision id, and timestamp.
         Retries on network/API errors.
+
+        With `max_workers` > 1 all titles are listed first and their
+        content is fetched in batches of `batch_size` titles concurrently.
         """
-        import time
+        if max_workers > 1:
+            return self._fetch_all_pages_concurrent(max_retries, backoff, batch_size, max_workers)
         S = requests.Session()
         params = {
             'action': 'query',
-            'format': 'json',
             'generator': 'allpages',
             'gaplimit': batch_size,
-            'prop': 'revisions',
-            'rvprop': 'ids|timestamp|content',
+            **REVISION_PARAMS,
+        }
+        return list(self._fetch_revisions(S, params, max_retries, backoff).values())
+
+    def _fetch_all_pages_concurrent(self, max_retries, backoff, batch_size, max_workers):
+        S = self._pooled_session(max_workers)
+        titles = self.list_titles(S, max_retries, backoff)
+        return self.fetch_pages(titles, max_retries, backoff, batch_size, max_workers, session=S)
+
+    @staticmethod
+    def _pooled_session(max_workers):
+        S = requests.Session()
+        # one connection per worker, reused across batches
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers * 2)
+        S.mount('https://', adapter)
+        S.mount('http://', adapter)
+        return S
+
+    def fetch_pages(self, titles, max_retries=3, backoff=2, batch_size=50, max_workers=1,
+                    session=None):
+        """Fetch and clean the content of the given page titles.
+
+        Titles are sent in batches of `batch_size`, `max_workers` batches at
+        a time. Returns page dicts like `fetch_all_pages`; titles that no
+        longer exist are missing from the result.
+        """
+        S = session or self._pooled_session(max_workers)
+        batches = [titles[i:i + batch_size] for i in range(0, len(titles), batch_size)]
+
+        def fetch_batch(batch):
+            params = {'action': 'query', 'titles': '|'.join(batch), **REVISION_PARAMS}
+            return self._fetch_revisions(S, params, max_retries, backoff, post=True)
+
+        all_results = {}
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for results in pool.map(fetch_batch, batches):
+                    all_results.update(results)
+        else:
+            for batch in batches:
+                all_results.update(fetch_batch(batch))
+        return list(all_results.values())
+
+    def list_revisions(self, max_retries=3, backoff=2):
+        """Return title, revid and timestamp of every page, without content.
+
+        Without content the API returns up to 500 pages per request, so
+        this is a cheap way to find the pages that changed.
+        """
+        params = {
+            'action': 'query',
+            'generator': 'allpages',
+            'gaplimit': 'max',
+            **REVISION_PARAMS,
+            'rvprop': 'ids|timestamp',
         }
-        all_results = []
-        gapcontinue = None
+        pages = self._fetch_revisions(requests.Session(), params, max_retries, backoff)
+        return [{'title': p['title'], 'revid': p['revid'], 'timestamp': p['timestamp']}
+                for p in pages.values()]
+
+    def list_titles(self, session=None, max_retries=3, backoff=2):
+        """Return the titles of all pages, without their content."""
+        session = session or requests.Session()
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'formatversion': 2,
+            'list': 'allpages',
+            'aplimit': 'max',
+            'maxlag': MAXLAG,
+        }
+        titles = []
+        while True:
+            data = self._query(session, params, max_retries, backoff)
+            titles.extend(p['title'] for p in data.get('query', {}).get('allpages', []))
+            if 'continue' not in data:
+                return titles
+            self._continue(params, data)
+
+    def _fetch_revisions(self, session, params, max_retries, backoff, post=False):
+        """Run a revisions query to completion; returns {title: page dict}."""
+        params = dict(params)
+        results = {}
         while True:
-            if gapcontinue:
-                params['gapcontinue'] = gapcontinue
-            else:
-                params.pop('gapcontinue', None)
-            attempt = 0
-            while attempt < max_retries:
-                try:
-                    response = S.get(self.api_url, params=params, timeout=10)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    pages = data.get('query', {}).get('pages', {})
-                    for page in pages.values():
-                        title = page.get('title')
-                        revisions = page.get('revisions', [{}])
-                        content = revisions[0].get('*', '') if revisions else ''
-                        # Clean wiki markup: remove section headings, image/file
-                        # links and reference tags so downstream chunking and
-                        # embedding only use plain article text.
-                        content = self.clean_content(content)
-                        revid = revisions[0].get('revid', None)
-                        timestamp = revisions[0].get('timestamp', None)
-                        all_results.append({
-                            'title': title,
-                            'content': content,
-                            'revid': revid,
-                            'timestamp': timestamp
-                        })
-                    break
-                except Exception:
-                    attempt += 1
-                    if attempt < max_retries:
-                        time.sleep(backoff * attempt)
-                    else:
-                        raise
-            if 'continue' in data and 'gapcontinue' in data['continue']:
-                gapcontinue = data['continue']['gapcontinue']
-            else:
-                break
-        return all_results
-
-    def clean_content(self, content: str) -> str:
+            data = self._query(session, params, max_retries, backoff, post=post)
+            for page in self._pages(data):
+                # with more pages than the API returns content for in one
+                # response, the rest come without revisions and are
+                # repeated after `rvcontinue`
+                if not page.get('revisions'):
+                    continue
+                result = self._parse_page(page)
+                results[result['title']] = result
+            if 'continue' not in data:
+                return results
+            self._continue(params, data)
+
+    @staticmethod
+    def _continue(params, data):
+        # the API may continue both the generator and the revisions;
+        # pass back every continuation key it returned
+        for key in list(params):
+            if key.endswith('continue'):
+                del params[key]
+        params.update(data['continue'])
+
+    def _query(self, session, params, max_retries, backoff, post=False):
+        """Send one API request, retrying network errors and throttling replies.
+
+        Long title lists are sent as POST to stay clear of URL length limits.
+        """
+        attempt = 0
+        while True:
+            try:
+                if post:
+                    response = session.post(self.api_url, data=params, timeout=10)
+                else:
+                    response = session.get(self.api_url, params=params, timeout=10)
+                if response.status_code == 429:
+                    raise ThrottledError(response.headers.get('Retry-After'))
+                response.raise_for_status()
+                data = response.json()
+                error = data.get('error')
+                if error:
+                    if error.get('code') == 'maxlag':
+                        raise ThrottledError(response.headers.get('Retry-After'))
+                    raise RuntimeError(f"MediaWiki API error: {error.get('info', error)}")
+                return data
+            except Exception as e:
+                attempt += 1
+                if attempt >= max_retries:
+                    raise
+                delay = backoff * attempt
+                if isinstance(e, ThrottledError) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                time.sleep(delay)
+
+    @staticmethod
+    def _pages(data):
+        pages = data.get('query', {}).get('pages', [])
+        # formatversion=2 returns a list, the legacy format a dict by page id
+        return pages.values() if isinstance(pages, dict) else pages
+
+    def _parse_page(self, page):
+        revisions = page.get('revisions') or [{}]
+        revision = revisions[0]
+        slot = revision.get('slots', {}).get('main', revision)
+        # formatversion=2 names the text 'content', the legacy format '*'
+        content = slot.get('content', slot.get('*', ''))
+        # Clean wiki markup: remove section headings, image/file
+        # links and reference tags so downstream chunking and
+        # embedding only use plain article text.
+        if self.clean:
+            content = self.clean_content(content)
+        return {
+            'title': page.get('title'),
+            'content': content,
+            'revid': revision.get('revid', None),
+            'timestamp': revision.get('timestamp', None),
+        }
+
+    @staticmethod
+    def clean_content(content: str) -> str:
         """
         Remove headings (== ... ==), image/file links ([[File:...]]),
         <ref>...</ref> tags, <references/> and basic HTML tags from the
         raw wikitext/content returned by the MediaWiki API. Returns a
         cleaned plain-text string.
         """
-        import re
-
         if not content:
             return content
 
-        # Remove section headings like == Heading == or === Sub ===
-        content = re.sub(r"^={2,}.*={2,}\s*$", "", content, flags=re.M)
-
-        # Remove File/Image links like [[File:Example.jpg|...]]
-        pattern_file = r"\[\[(?:File|Image):[^\[\]]*\]\]"
-        content = re.sub(pattern_file, "", content, flags=re.I)
-
-        # Remove <ref>...</ref> and self-closing <ref /> tags
-        content = re.sub(
-            r"<ref[^>]*>.*?</ref>",
-            "",
-            content,
-            flags=re.S | re.I,
-        )
-        content = re.sub(r"<ref[^>]*/>", "", content, flags=re.I)
-
-        # Remove <references/> and <references>...</references>
-        content = re.sub(
-            r"<references[^>]*>.*?</references>",
-            "",
-            content,
-            flags=re.S | re.I,
-        )
-        content = re.sub(r"<references[^>]*/>", "", content, flags=re.I)
-
-        # Remove any remaining HTML tags
-        content = re.sub(r"<[^>]+>", "", content)
-
-        # Remove common image/file templates like {{Infobox ...}} minimally
-        # (keep simple: remove {{File:...}} variants)
-        content = re.sub(r"\{\{ ?[Ff]ile:[^}]*\}\}", "", content)
+        # Remove headings, file links, <ref>/<references> tags, remaining
+        # HTML tags and {{File:...}} templates in a single pass
+        content = _RE_CLEAN.sub("", content)
 
         # Collapse multiple blank lines and trim
-        content = re.sub(r"\n{2,}", "\n\n", content).strip()
+        content = _RE_BLANK.sub("\n\n", content).strip()
 
         return content
@@ -4,17 +4,135 @@ Provides a simple interface and a GPT4All adapter with optional
 auto-download support via `src.download.ensure_model`.
 """
 
-from typing import Optional, List
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterator, Optional, List
 from dataclasses import dataclass
 
+import numpy as np
+
+
+try:
+    from .prompts import compile_prompt
+except ImportError:
+    # scripts put `src` on sys.path and import modules top-level
+    from prompts import compile_prompt
+
+# prompt length estimate for GPT4All: characters per token, and tokens
+# kept free besides the answer
+CHARS_PER_TOKEN = 4
+PROMPT_RESERVE_TOKENS = 64
+
+# idle connections kept open to the Ollama server, and for how long (s)
+OLLAMA_KEEPALIVE_CONNECTIONS = 10
+OLLAMA_KEEPALIVE_EXPIRY = 120
+
 
 class LLMError(Exception):
     pass
 
 
+class SemanticCache:
+    """Bounded LRU of generated answers.
+
+    Answers are found by the exact rendered prompt (a dict lookup) or, for
+    a new prompt, by a cached question whose embedding has a cosine
+    similarity of at least `threshold` with the new question.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        # prompt digest -> (unit question embedding or None, answer)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(prompt: str) -> bytes:
+        return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+
+    @staticmethod
+    def _unit(vec):
+        vec = np.asarray(vec, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = self._key(prompt)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_similar(self, query_emb) -> Optional[str]:
+        q = self._unit(query_emb)
+        keys = [k for k, (vec, _) in self._entries.items() if vec is not None]
+        if q is None or not keys:
+            return None
+        scores = np.stack([self._entries[k][0] for k in keys]) @ q
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]][1]
+
+    def put(self, prompt: str, answer: str, query_emb=None):
+        vec = self._unit(query_emb) if query_emb is not None else None
+        key = self._key(prompt)
+        self._entries[key] = (vec, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _render_prompt(chunks: List[str], prompt_template: str, question: str) -> str:
+    # Assemble context and render template
+    context = "\n\n".join(chunks or [])
+    try:
+        return compile_prompt(prompt_template)(context, question)
+    except Exception:
+        # Fallback: simple concatenation
+        return f"{context}\n\nQuestion: {question}"
+
+
+def _serialized(load):
+    """Run an adapter's `_load` under its lock, so a preload thread and
+    the first request never load the model twice."""
+
+    @functools.wraps(load)
+    def wrapper(self):
+        with self._load_lock:
+            return load(self)
+
+    return wrapper
+
+
 class LLM:
     """Abstract LLM interface."""
 
+    def preload(self):
+        """Start loading the model in a background thread.
+
+        Returns immediately. The first request waits for the load to
+        finish; if it failed, that request loads again and raises.
+        """
+
+        def run():
+            try:
+                self._load()
+            except Exception:
+                pass
+
+        threading.Thread(target=run, name="llm-preload", daemon=True).start()
+
     def generate(
         self, prompt: str, max_tokens: int = 512, temperature: float = 0.0
     ) -> str:
@@ -35,7 +153,9 @@ class GPT4AllAdapter(LLM):
 
     def __post_init__(self):
         self._model = None
+        self._load_lock = threading.Lock()
 
+    @_serialized
     def _load(self):
         if self._model is not None:
             return
@@ -101,18 +221,23 @@ class GPT4AllAdapter(LLM):
     ) -> str:
         """Compatibility wrapper: render the prompt template with `{context}` and
         `{question}` then call the normal `generate` method.
+
+        Chunks are expected best first; the last ones are dropped while the
+        prompt would not leave room for `max_tokens` within `n_ctx`.
         """
         if max_tokens is None:
             max_tokens = self.max_tokens
         if temperature is None:
             temperature = self.temperature
 
-        context = "\n\n".join(chunks or [])
-        try:
-            prompt = prompt_template.format(context=context, question=question)
-        except Exception:
-            prompt = f"{context}\n\nQuestion: {question}"
-
+        chunks = list(chunks or [])
+        # rough estimate; keeps GPT4All from tokenizing context it would
+        # only truncate
+        budget = (self.n_ctx - max_tokens - PROMPT_RESERVE_TOKENS) * CHARS_PER_TOKEN
+        prompt = _render_prompt(chunks, prompt_template, question)
+        while len(chunks) > 1 and len(prompt) > budget:
+            chunks.pop()
+            prompt = _render_prompt(chunks, prompt_template, question)
         return self.generate(prompt, max_tokens=max_tokens, temperature=temperature)
 
 
@@ -130,11 +255,20 @@ class OllamaAdapter(LLM):
     max_tokens: int = 512
     temperature: float = 0.0
     timeout: int = 30
+    # answers kept by SemanticCache; 0 disables caching
+    cache_size: int = 0
+    cache_threshold: float = 0.95
+    # maps a question to its embedding for near-duplicate cache hits;
+    # without it only identical prompts are served from the cache
+    embed_fn: Optional[Callable[[str], object]] = None
 
     def __post_init__(self):
         self._available = False
         self._client = None
+        self._load_lock = threading.Lock()
+        self.cache = SemanticCache(self.cache_size, self.cache_threshold) if self.cache_size > 0 else None
 
+    @_serialized
     def _load(self):
         # Lazily import and instantiate the Ollama client. On failure,
         # raise LLMError so callers know the adapter is not usable.
@@ -144,7 +278,22 @@ class OllamaAdapter(LLM):
         try:
             from ollama import Client
 
-            self._client = Client(host=self.base_url)
+            try:
+                # ollama.Client keeps one httpx connection pool for its
+                # lifetime; keep idle connections longer than httpx's 5s
+                # default so the next question skips the TCP handshake
+                import httpx
+
+                self._client = Client(
+                    host=self.base_url,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=OLLAMA_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+                    ),
+                )
+            except (ImportError, TypeError):
+                # older clients accept only the host
+                self._client = Client(host=self.base_url)
         except Exception as e:
             raise LLMError(f"Failed to load ollama client: {e}")
 
@@ -177,6 +326,72 @@ class OllamaAdapter(LLM):
         except Exception as e:
             raise LLMError(f"Failed to verify Ollama model availability: {e}")
 
+    def _cached_answer(self, prompt: str, question: str):
+        """Return (cached answer or None, question embedding or None)."""
+        if self.cache is None:
+            return None, None
+        cached = self.cache.get(prompt)
+        if cached is not None:
+            return cached, None
+        query_emb = None
+        if self.embed_fn is not None and question:
+            try:
+                query_emb = self.embed_fn(question)
+            except Exception:
+                query_emb = None
+            if query_emb is not None:
+                cached = self.cache.get_similar(query_emb)
+        return cached, query_emb
+
+    def generate_from_chunks_stream(
+        self,
+        chunks: List[str],
+        prompt_template: str,
+        question: str,
+        max_tokens: int = None,
+        temperature: float = None,
+    ) -> Iterator[str]:
+        """Like `generate_from_chunks`, but yield the answer piece by piece
+        as the server produces it.
+
+        Use this when the answer is shown to a user: the first words appear
+        without waiting for the whole completion. A cached answer is
+        yielded in one piece.
+        """
+        prompt = _render_prompt(chunks, prompt_template, question)
+        cached, query_emb = self._cached_answer(prompt, question)
+        if cached is not None:
+            yield cached
+            return
+
+        self._load()
+        if not hasattr(self._client, "generate"):
+            # chat-only clients are not streamed
+            yield self.generate_from_chunks(
+                chunks, prompt_template, question, max_tokens, temperature
+            )
+            return
+
+        parts = []
+        try:
+            for part in self._client.generate(
+                model=self.model_name, prompt=prompt, stream=True
+            ):
+                if isinstance(part, dict):
+                    text = part.get("response")
+                else:
+                    text = getattr(part, "response", None)
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            raise LLMError(f"Ollama generation failed: {e}")
+
+        if not parts:
+            raise LLMError("Ollama returned no textual output")
+        if self.cache is not None:
+            self.cache.put(prompt, "".join(parts), query_emb)
+
     def generate_from_chunks(
         self,
         chunks: List[str],
@@ -189,21 +404,20 @@ class OllamaAdapter(LLM):
         the Ollama client synchronously, and return the model's text output.
 
         The template should include `{context}` and `{question}` placeholders.
+        With a cache configured, repeated or near-identical questions are
+        answered without contacting the server.
         """
-        self._load()
-
         if max_tokens is None:
             max_tokens = self.max_tokens
         if temperature is None:
             temperature = self.temperature
 
-        # Assemble context and render template
-        context = "\n\n".join(chunks or [])
-        try:
-            prompt = prompt_template.format(context=context, question=question)
-        except Exception:
-            # Fallback: simple concatenation
-            prompt = f"{context}\n\nQuestion: {question}"
+        prompt = _render_prompt(chunks, prompt_template, question)
+        cached, query_emb = self._cached_answer(prompt, question)
+        if cached is not None:
+            return cached
+
+        self._load()
 
         try:
             # Prefer a generate() method if present, else try chat()
@@ -289,6 +503,8 @@ class OllamaAdapter(LLM):
 
         extracted = _extract(resp)
         if extracted:
+            if self.cache is not None:
+                self.cache.put(prompt, extracted, query_emb)
             return extracted
 
         # If extraction failed, error so callers can fall back if desired
@@ -308,8 +524,12 @@ class OllamaAdapter(LLM):
         )
 
 
-def get_llm(cfg: dict, validate: bool = True) -> Optional[LLM]:
-    """Factory: returns an LLM instance or None if disabled/not configured."""
+def get_llm(cfg: dict, validate: bool = True, preload: bool = False) -> Optional[LLM]:
+    """Factory: returns an LLM instance or None if disabled/not configured.
+
+    With `validate=False` and `preload=True` the model is loaded in the
+    background while the caller continues (see `LLM.preload`).
+    """
     if not cfg:
         return None
 
@@ -347,6 +567,8 @@ def get_llm(cfg: dict, validate: bool = True) -> Optional[LLM]:
         # to False to defer loading (useful in tests or lightweight runs).
         if validate:
             adapter._load()
+        elif preload:
+            adapter.preload()
         return adapter
     elif provider == "ollama":
         model_identifier = llm_cfg.get("model") or llm_cfg.get("model_name")
@@ -358,11 +580,19 @@ def get_llm(cfg: dict, validate: bool = True) -> Optional[LLM]:
             base_url=llm_cfg.get("base_url", "http://127.0.0.1:11434"),
             max_tokens=llm_cfg.get("max_tokens", 512),
             temperature=llm_cfg.get("temperature", 0.0),
+            cache_size=(
+                llm_cfg.get("semantic_cache_size", 512)
+                if llm_cfg.get("semantic_cache", False)
+                else 0
+            ),
+            cache_threshold=llm_cfg.get("semantic_cache_threshold", 0.95),
         )
 
         # Verify that Ollama is reachable at factory time if requested
         if validate:
             adapter._load()
+        elif preload:
+            adapter.preload()
         return adapter
     else:
         # Unknown provider: future extension point
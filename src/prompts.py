@@ -1,10 +1,46 @@
 """Prompt helpers for RAG templates."""
+import os
+from functools import lru_cache
 from pathlib import Path
+from string import Formatter
 
 
 def load_prompt(path: str) -> str:
     p = Path(path)
-    if not p.exists():
+    try:
+        mtime_ns = os.stat(p).st_mtime_ns
+    except FileNotFoundError:
         raise FileNotFoundError(f"Prompt template not found: {path}")
-    with open(p, 'r', encoding='utf-8') as f:
+    # keyed on the modification time so an edited template is re-read
+    return _read_prompt(str(p), mtime_ns)
+
+
+@lru_cache(maxsize=32)
+def _read_prompt(path: str, mtime_ns: int) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
         return f.read()
+
+
+@lru_cache(maxsize=32)
+def compile_prompt(template: str):
+    """Return a `render(context, question)` function for `template`.
+
+    The template is parsed once; rendering then only joins the literal
+    text with the two values. Templates using other fields, conversions or
+    format specs are rendered with `str.format` and raise like it does.
+    """
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if literal:
+            parts.append((False, literal))
+        if field is None:
+            continue
+        if field not in ('context', 'question') or spec or conversion:
+            return lambda context, question: template.format(context=context, question=question)
+        parts.append((True, field))
+
+    def render(context, question):
+        values = {'context': str(context), 'question': str(question)}
+        return ''.join(values[text] if is_field else text for is_field, text in parts)
+
+    return render
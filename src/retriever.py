@@ -1,29 +1,181 @@
 # Search/similarity logic for Wiki RAG
 
+import math
+
 import numpy as np
+try:
+    # optional SIMD cosine kernels; numpy is used when not installed
+    import simsimd
+except ImportError:
+    simsimd = None
+try:
+    # optional JIT for the MMR selection loop and the cosine kernel; both
+    # run as Python/NumPy otherwise
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+
+def _cosine_rows(q, m, out):
+    """Cosine of `q` with every row of `m`, written to `out`.
+
+    Dot product and row norm are accumulated in the same pass over `m`.
+    """
+    nq = 0.0
+    for d in range(q.shape[0]):
+        nq += q[d] * q[d]
+    nq = math.sqrt(nq)
+    for i in prange(m.shape[0]):
+        s = 0.0
+        n = 0.0
+        for d in range(m.shape[1]):
+            v = m[i, d]
+            s += q[d] * v
+            n += v * v
+        denom = nq * math.sqrt(n)
+        out[i] = s / denom if denom != 0.0 else 0.0
+
+
+if njit is not None:
+    _cosine_rows = njit(parallel=True, fastmath=True, cache=True)(_cosine_rows)
+else:
+    _cosine_rows = None
 
 
-def cosine_similarity(query_emb, chunk_embs):
+def cosine_similarity(query_emb, chunk_embs, normalized=False):
     """Compute cosine similarity between a single query embedding and
     an array-like of chunk embeddings.
 
+    With `normalized=True` the rows of `chunk_embs` are taken to be unit
+    length (see `normalize_rows`) and only the query is normalized.
+
     Returns a 1-D numpy array of scores with the same length as
     `chunk_embs`.
     """
-    query_emb = np.array(query_emb)
-    chunk_embs = np.array(chunk_embs)
+    # asarray leaves float32 ndarrays as they are instead of copying the
+    # whole matrix
+    query_emb = np.asarray(query_emb, dtype=np.float32)
+    if isinstance(chunk_embs, QuantizedRows):
+        # quantized rows are always unit length
+        return chunk_embs.dot(query_emb / max(float(np.linalg.norm(query_emb)), 1e-12))
+    chunk_embs = np.asarray(chunk_embs, dtype=np.float32)
     if chunk_embs.size == 0:
         return np.array([])
+    if normalized:
+        q = query_emb / max(float(np.linalg.norm(query_emb)), 1e-12)
+        return np.dot(chunk_embs, q)
+    if (simsimd is not None and chunk_embs.ndim == 2 and np.any(query_emb)):
+        # one fused pass computing dot products and norms together
+        q = np.ascontiguousarray(query_emb).reshape(1, -1)
+        dist = np.asarray(simsimd.cdist(q, np.ascontiguousarray(chunk_embs), metric='cosine'))
+        return 1.0 - dist[0]
+    if (_cosine_rows is not None and chunk_embs.ndim == 2
+            and query_emb.shape == chunk_embs.shape[1:]):
+        # one parallel pass instead of separate dot, norm and divide passes
+        out = np.empty(len(chunk_embs), dtype=np.float32)
+        _cosine_rows(np.ascontiguousarray(query_emb), np.ascontiguousarray(chunk_embs), out)
+        return out
     dot = np.dot(chunk_embs, query_emb)
     norm_query = np.linalg.norm(query_emb)
     norm_chunks = np.linalg.norm(chunk_embs, axis=1)
     # protect against zero division
     denom = norm_query * norm_chunks
-    denom[denom == 0] = 1e-12
+    np.maximum(denom, 1e-12, out=denom)
     return dot / denom
 
 
-def search_chunks(query_emb, chunk_embs, chunks, top_k=5, threshold=0.3):
+def normalize_rows(embs):
+    """Return `embs` as a C-contiguous float32 array with unit-length rows.
+
+    If the input already satisfies that (e.g. a memory-mapped index that was
+    written normalized) it is returned without a copy; otherwise a normalized
+    copy is made. Rows with zero norm are left as zeros so they score 0
+    against any query.
+    """
+    arr = np.asarray(embs, dtype=np.float32)
+    if arr.ndim != 2 or arr.size == 0:
+        return arr
+    # squared norms via einsum: unlike linalg.norm this does not square the
+    # whole matrix into a temporary, which matters when checking a large
+    # memory-mapped file that is already normalized
+    sq = np.einsum('ij,ij->i', arr, arr)
+    if arr.flags['C_CONTIGUOUS'] and np.allclose(sq, 1.0, atol=2e-4):
+        return arr
+    arr = np.array(arr, dtype=np.float32, order='C')
+    # in place; zero rows divide by the floor and stay zero
+    norms = np.sqrt(sq, out=sq)
+    np.maximum(norms, 1e-12, out=norms)
+    arr /= norms[:, None]
+    return arr
+
+
+class QuantizedRows:
+    """Unit-length embedding rows stored as int8 plus one float32 scale per row.
+
+    Takes a quarter of the memory of the float32 matrix. `dot` scores
+    queries block by block: each block of rows is widened to float32 only
+    while it is multiplied, so the full matrix is never materialized.
+    """
+
+    # rows widened per step; a block stays well inside the CPU caches
+    block_rows = 4096
+
+    def __init__(self, values, scales):
+        self.values = values
+        self.scales = scales
+
+    @classmethod
+    def from_float(cls, embs):
+        unit = normalize_rows(embs)
+        scales = np.abs(unit).max(axis=1) / 127.0 if unit.size else np.zeros(len(unit))
+        scales = scales.astype(np.float32)
+        scales[scales == 0] = 1.0
+        values = np.round(unit / scales[:, None]).astype(np.int8)
+        return cls(values, scales)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def dequantize(self, rows=slice(None)):
+        """Float32 copy of the selected rows."""
+        return self.values[rows].astype(np.float32) * self.scales[rows, None]
+
+    def dot(self, queries):
+        """Scores of a (D,) query or (Q, D) queries against every row.
+
+        Returns an (N,) or (Q, N) float32 array, like `rows @ queries.T`.
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        n = len(self.values)
+        out = np.empty((n,) + q.shape[:-1], dtype=np.float32)
+        for start in range(0, n, self.block_rows):
+            stop = min(start + self.block_rows, n)
+            scales = self.scales[start:stop]
+            if q.ndim == 2:
+                scales = scales[:, None]
+            out[start:stop] = (self.values[start:stop].astype(np.float32) @ q.T) * scales
+        return out.T if q.ndim == 2 else out
+
+
+def _top_k_indices(scores, k):
+    """Indices of the `k` highest scores, best first.
+
+    Selects in linear time with argpartition and sorts only the selection.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def search_chunks(query_emb, chunk_embs, chunks, top_k=5, threshold=0.3, normalized=False,
+                  return_indices=False):
     """Return up to `top_k` chunks with cosine similarity >= `threshold`.
 
     Args:
@@ -32,35 +184,115 @@ def search_chunks(query_emb, chunk_embs, chunks, top_k=5, threshold=0.3):
         chunks: list of chunk dicts aligned with `chunk_embs` ordering.
         top_k: maximum number of results to return.
         threshold: minimum cosine score to include a result.
+        normalized: set when the rows of `chunk_embs` are already unit
+            length (see `normalize_rows`); cosine then reduces to a dot
+            product against the normalized query.
+        return_indices: also return the row of each result in `chunk_embs`.
 
     Returns:
-        List of (chunk_dict, float(score)) sorted by descending score.
+        List of (chunk_dict, float(score)) sorted by descending score, or
+        (chunk_dict, float(score), int(index)) with `return_indices`.
     """
     # Defensive checks
     if chunk_embs is None or len(chunk_embs) == 0 or not chunks:
         return []
 
-    scores = cosine_similarity(query_emb, chunk_embs)
+    scores = cosine_similarity(query_emb, chunk_embs, normalized=normalized)
     if scores.size == 0:
         return []
 
-    # Get indices sorted by descending score
-    order = np.argsort(scores)[::-1]
     results = []
-    for idx in order:
-        if len(results) >= top_k:
-            break
+    for idx in _top_k_indices(scores, top_k):
         score = float(scores[idx])
         if score >= threshold:
             try:
-                results.append((chunks[int(idx)], score))
+                if return_indices:
+                    results.append((chunks[int(idx)], score, int(idx)))
+                else:
+                    results.append((chunks[int(idx)], score))
             except Exception:
                 # index mismatch or bad chunk list - skip
                 continue
     return results
 
 
-def mmr_rerank(query_emb, candidate_embs, candidate_chunks, top_k=5, fetch_k=20, lambda_param=0.5):
+def search_chunks_batch(query_embs, chunk_embs, chunks, top_k=5, threshold=0.3, normalized=False):
+    """Batched `search_chunks`: score all queries with one matrix product.
+
+    `query_embs` is a (Q, D) array-like. Returns a list with one result list
+    per query, each in the same format as `search_chunks`.
+    """
+    queries = np.atleast_2d(np.asarray(query_embs, dtype=np.float32))
+    if chunk_embs is None or len(chunk_embs) == 0 or not chunks:
+        return [[] for _ in range(len(queries))]
+    # (Q, D) @ (D, N) visits the corpus once for all queries
+    if isinstance(chunk_embs, QuantizedRows):
+        scores = chunk_embs.dot(normalize_rows(queries))
+    else:
+        if not normalized:
+            chunk_embs = normalize_rows(chunk_embs)
+        scores = np.dot(normalize_rows(queries), np.asarray(chunk_embs).T)
+    k = min(top_k, scores.shape[1])
+    if k <= 0:
+        return [[] for _ in range(len(queries))]
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    batch = []
+    for row, cand in zip(scores, part):
+        results = []
+        for idx in cand[np.argsort(-row[cand])]:
+            score = float(row[idx])
+            if score >= threshold:
+                try:
+                    results.append((chunks[int(idx)], score))
+                except Exception:
+                    continue
+        batch.append(results)
+    return batch
+
+
+def _mmr_select(sims, pairwise, top_k, lam):
+    """Greedy MMR selection over candidates sorted by descending `sims`.
+
+    `pairwise` holds the candidate-to-candidate similarities. Returns the
+    positions of the picked candidates in pick order. The redundancy of
+    each candidate (its highest similarity to any pick so far) is updated
+    once per pick instead of being recomputed for every comparison.
+    """
+    n = sims.shape[0]
+    k = min(top_k, n)
+    picks = np.empty(k, dtype=np.int64)
+    if k == 0:
+        return picks
+    selected = np.zeros(n, dtype=np.bool_)
+    # the most similar to the query comes first
+    picks[0] = 0
+    selected[0] = True
+    max_red = pairwise[0].copy()
+    for j in range(1, k):
+        best = -1
+        best_score = 0.0
+        for i in range(n):
+            if selected[i]:
+                continue
+            score = lam * sims[i] - (1.0 - lam) * max_red[i]
+            if best < 0 or score > best_score:
+                best = i
+                best_score = score
+        picks[j] = best
+        selected[best] = True
+        for i in range(n):
+            if pairwise[best, i] > max_red[i]:
+                max_red[i] = pairwise[best, i]
+    return picks
+
+
+if njit is not None:
+    # compiled on first use and cached on disk for later processes
+    _mmr_select = njit(cache=True)(_mmr_select)
+
+
+def mmr_rerank(query_emb, candidate_embs, candidate_chunks, top_k=5, fetch_k=20, lambda_param=0.5,
+               normalized=False):
     """Perform Maximal Marginal Relevance (MMR) reranking.
 
     Args:
@@ -70,6 +302,8 @@ def mmr_rerank(query_emb, candidate_embs, candidate_chunks, top_k=5, fetch_k=20,
         top_k: number of final results to return.
         fetch_k: number of top candidates to consider before MMR (speed/quality tradeoff).
         lambda_param: trade-off parameter between relevance and diversity (0..1).
+        normalized: set when the candidate rows are already unit length, e.g.
+            taken from the normalized matrix `Storage` keeps.
 
     Returns:
         List of (chunk, score) tuples of length <= top_k.
@@ -77,67 +311,31 @@ def mmr_rerank(query_emb, candidate_embs, candidate_chunks, top_k=5, fetch_k=20,
     if candidate_embs is None or len(candidate_embs) == 0:
         return []
 
-    embs = np.array(candidate_embs)
-    q = np.array(query_emb)
-    # compute cosine similarities
-    sims = cosine_similarity(q, embs)
-    # consider top fetch_k candidates by similarity
-    order = np.argsort(sims)[::-1][:fetch_k]
-    candidate_ids = list(order)
-
-    selected = []  # indices
-    selected_scores = []
-
-    # precompute pairwise similarities among candidates
-    if len(candidate_ids) > 0:
-        cand_embs_top = embs[candidate_ids]
-        pairwise = np.matmul(cand_embs_top, cand_embs_top.T)
+    # unit rows once, so both the query scores and the pairwise matrix
+    # below are plain dot products
+    if normalized:
+        embs = np.asarray(candidate_embs, dtype=np.float32)
     else:
-        pairwise = np.array([[]])
-
-    # mapping from local top-k index to global index
-    for _ in range(min(top_k, len(candidate_ids))):
-        if not selected:
-            # pick the most similar to query first
-            best_local = 0
-            best_global = candidate_ids[best_local]
-            selected.append(best_global)
-            selected_scores.append(float(sims[best_global]))
-            continue
+        embs = normalize_rows(candidate_embs)
+    sims = cosine_similarity(query_emb, embs, normalized=True)
+    # consider top fetch_k candidates by similarity
+    order = _top_k_indices(sims, fetch_k)
+    if len(order) == 0:
+        return []
 
-        best_score = None
-        best_global = None
-        for rank_pos, global_idx in enumerate(candidate_ids):
-            if global_idx in selected:
-                continue
-            rel = float(sims[global_idx])
-            # compute redundancy as max similarity to already selected
-            # need local index into cand_embs_top
-            try:
-                local_pos = candidate_ids.index(global_idx)
-            except ValueError:
-                continue
-            if selected:
-                # compute max similarity to any selected (using pairwise)
-                sel_local_positions = [candidate_ids.index(s) for s in selected]
-                redundancy = max(pairwise[local_pos, pos] for pos in sel_local_positions)
-            else:
-                redundancy = 0.0
-            mmr_score = lambda_param * rel - (1 - lambda_param) * redundancy
-            if best_score is None or mmr_score > best_score:
-                best_score = mmr_score
-                best_global = global_idx
-
-        if best_global is None:
-            break
-        selected.append(best_global)
-        selected_scores.append(float(sims[best_global]))
+    # precompute pairwise similarities among candidates; a contiguous
+    # float32 block makes this a single SGEMM, and with unit rows the
+    # products already are cosine similarities
+    cand = np.ascontiguousarray(embs[order], dtype=np.float32)
+    pairwise = cand @ cand.T
+    picks = _mmr_select(np.ascontiguousarray(sims[order], dtype=np.float32), pairwise,
+                        int(top_k), float(lambda_param))
 
     # return corresponding chunks with original cosine scores
     results = []
-    for idx, score in zip(selected, selected_scores):
+    for idx in order[picks]:
         try:
-            results.append((candidate_chunks[int(idx)], score))
+            results.append((candidate_chunks[int(idx)], float(sims[idx])))
         except Exception:
             continue
     return results
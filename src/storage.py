@@ -10,52 +10,285 @@ import getpass
 import socket
 import os
 import datetime
+import uuid
+import operator
+from collections import OrderedDict
+from collections.abc import Sequence
+try:
+    # optional C JSON codecs for the chunk files, msgspec preferred;
+    # stdlib json otherwise
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
 try:
     # optional import for fast vector search
     from .vectorstore import FaissVectorStore
 except Exception:
     FaissVectorStore = None
+try:
+    from .retriever import search_chunks, search_chunks_batch, mmr_rerank, normalize_rows, QuantizedRows
+except ImportError:
+    # scripts put `src` on sys.path and import modules top-level
+    from retriever import search_chunks, search_chunks_batch, mmr_rerank, normalize_rows, QuantizedRows
+
+
+if msgspec is not None:
+    _encode_chunk = msgspec.json.Encoder().encode
+    _decode_chunk = msgspec.json.Decoder().decode
+elif orjson is not None:
+    _encode_chunk = orjson.dumps
+    _decode_chunk = orjson.loads
+else:
+    def _encode_chunk(chunk):
+        return json.dumps(chunk, ensure_ascii=False).encode('utf-8')
+    _decode_chunk = json.loads
+
+# int8 copy of the embeddings and its per-row scales (storage.int8_search)
+INT8_EMBEDDINGS_FILE = 'embeddings_int8.npy'
+INT8_SCALES_FILE = 'embeddings_scales.npy'
+
+
+def _fsync_file(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    """Persist renames in directory `path` (POSIX only)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # some network filesystems cannot sync directories
+        pass
+    finally:
+        os.close(fd)
+
+
+def embeddings_fingerprint(path):
+    """Cheap identity of an embeddings file: its size and mtime.
+
+    Index copies keep the mtime (copystat), so a FAISS index built next to
+    the file can be matched to it without reading the embeddings.
+    """
+    st = os.stat(path)
+    return f'{st.st_size}:{int(st.st_mtime)}'
+
+
+class _LazyChunks(Sequence):
+    """Read-only list of chunks that parses a line only when it is indexed.
+
+    `offsets` holds the byte offset of every line of the JSONL file plus
+    the file size as a final entry. Recently read chunks are cached so that
+    repeated lookups return the same dict, which `index()` relies on.
+    """
+
+    def __init__(self, path, offsets, loads, cache_size=4096):
+        self._fp = open(path, 'rb')
+        self._offsets = offsets
+        self._loads = loads
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('chunk index out of range')
+        chunk = self._cache.get(i)
+        if chunk is not None:
+            self._cache.move_to_end(i)
+            return chunk
+        self._fp.seek(int(self._offsets[i]))
+        chunk = self._loads(self._fp.read(int(self._offsets[i + 1] - self._offsets[i])))
+        self._cache[i] = chunk
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def index(self, chunk, start=0, stop=None):
+        # chunks handed out by __getitem__ are cached, so look them up by
+        # identity before falling back to a full scan
+        for i, cached in self._cache.items():
+            if cached is chunk:
+                return i
+        return super().index(chunk, start, len(self) if stop is None else stop)
+
+    def close(self):
+        self._fp.close()
 
 
 class Storage:
 
-    def __init__(self, base_path):
+    def __init__(self, base_path, faiss_index='flat', device='cpu'):
         self.base_path = Path(base_path)
+        # index type used when the FAISS index has to be rebuilt locally
+        self.faiss_index = faiss_index
+        # 'cuda' keeps the normalized matrix on the GPU for exact search
+        self.device = device or 'cpu'
         self.chunks = None
         self.embeddings = None
+        # L2-normalized float32 copy of `embeddings`, built once per load,
+        # or their QuantizedRows when the index has an int8 copy
+        self._embeddings_unit = None
+        self._embeddings_gpu = None
 
-    def save_chunks(self, chunks, path=None):
-        path = path or self.base_path / 'chunks.jsonl'
+    def save_chunks(self, chunks, path=None, durable=True):
+        """Write chunks.jsonl and its chunks.idx line offsets atomically.
+
+        With `durable` both files are fsynced before they replace the old
+        ones and the directory is fsynced after, so a crash leaves either
+        the old or the new files, never empty ones.
+        """
+        path = Path(path or self.base_path / 'chunks.jsonl')
         tmp_path = str(path) + '.tmp'
-        with open(tmp_path, 'w', encoding='utf-8') as f:
+        # byte offset of every line, used by load_chunks(lazy=True)
+        offsets = [0]
+        with open(tmp_path, 'wb') as f:
             for chunk in chunks:
-                f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+                line = _encode_chunk(chunk) + b'\n'
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+            if durable:
+                _fsync_file(f)
+        idx_tmp = str(path.with_suffix('.idx')) + '.tmp'
+        with open(idx_tmp, 'wb') as f:
+            np.array(offsets, dtype=np.uint64).tofile(f)
+            if durable:
+                _fsync_file(f)
         Path(tmp_path).replace(path)
+        Path(idx_tmp).replace(path.with_suffix('.idx'))
+        if durable:
+            _fsync_dir(path.parent)
 
-    def save_embeddings(self, embeddings, path=None):
-        path = path or self.base_path / 'embeddings.npy'
-        tmp_path = str(path) + '.tmp'
-        np.save(tmp_path, embeddings)
-        # np.save creates .npy file, so rename explicitly
-        tmp_npy_path = tmp_path if tmp_path.endswith('.npy') else tmp_path + '.npy'
-        if not Path(tmp_npy_path).exists():
-            # np.save may have created tmp_path+'.npy' instead of tmp_path
-            tmp_npy_path = tmp_path + '.npy'
-        Path(tmp_npy_path).replace(path)
-
-    def load_chunks(self, path=None):
-        path = path or self.base_path / 'chunks.jsonl'
-        with open(path, 'r', encoding='utf-8') as f:
-            data = [json.loads(line) for line in f]
+    def save_embeddings(self, embeddings, path=None, durable=True):
+        """Write an .npy file atomically; see `save_chunks` for `durable`."""
+        path = Path(path or self.base_path / 'embeddings.npy')
+        tmp_path = path.with_name(path.name + '.tmp')
+        # saving through an open file keeps np.save from appending '.npy';
+        # a C-contiguous numeric array is written straight from its buffer
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(embeddings), allow_pickle=False)
+            if durable:
+                _fsync_file(f)
+        tmp_path.replace(path)
+        if durable:
+            _fsync_dir(path.parent)
+
+    def save_embeddings_int8(self, embeddings, directory=None):
+        """Write the int8-quantized unit rows used for brute-force search.
+
+        `load_embeddings` prefers these files over normalizing
+        embeddings.npy into a float32 copy, which needs 4x the memory.
+        """
+        directory = Path(directory or self.base_path)
+        quantized = QuantizedRows.from_float(embeddings)
+        self.save_embeddings(quantized.values, directory / INT8_EMBEDDINGS_FILE)
+        self.save_embeddings(quantized.scales, directory / INT8_SCALES_FILE)
+
+    def _load_int8(self, n_rows):
+        try:
+            values = np.load(self.base_path / INT8_EMBEDDINGS_FILE, mmap_mode='r', allow_pickle=False)
+            scales = np.load(self.base_path / INT8_SCALES_FILE, allow_pickle=False)
+        except OSError:
+            return None
+        if len(values) != n_rows or len(scales) != n_rows:
+            return None
+        return QuantizedRows(values, scales)
+
+    def load_chunks(self, path=None, lazy=False):
+        """Load all chunks, or with `lazy=True` only parse them on access.
+
+        Lazy loading needs the `chunks.idx` offsets written by save_chunks;
+        without a matching offset file all chunks are parsed up front.
+        """
+        path = Path(path or self.base_path / 'chunks.jsonl')
+        self._close_chunks()
+        if lazy:
+            offsets = self._load_chunk_offsets(path)
+            if offsets is not None:
+                self.chunks = _LazyChunks(path, offsets, _decode_chunk)
+                return self.chunks
+        data = list(self.iter_chunks(path))
         # store in instance for callers that expect attributes
         self.chunks = data
         return data
 
-    def load_embeddings(self, path=None):
+    def iter_chunks(self, path=None):
+        """Yield the chunks one at a time without keeping them in memory.
+
+        For consumers that only pass chunks on, e.g. to embed and index them
+        in batches; unlike `load_chunks` it does not set `self.chunks`.
+        """
+        path = Path(path or self.base_path / 'chunks.jsonl')
+        # all decoders take UTF-8 bytes, so skip text decoding per line;
+        # isspace() skips blank lines without copying every line like strip()
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.isspace():
+                    yield _decode_chunk(line)
+
+    def _load_chunk_offsets(self, path):
+        idx_path = path.with_suffix('.idx')
+        try:
+            offsets = np.fromfile(idx_path, dtype=np.uint64)
+            size = path.stat().st_size
+        except OSError:
+            return None
+        # the last offset is the file size; anything else means the offsets
+        # belong to another version of the file
+        if len(offsets) == 0 or int(offsets[-1]) != size:
+            return None
+        return offsets
+
+    def _close_chunks(self):
+        if isinstance(self.chunks, _LazyChunks):
+            self.chunks.close()
+
+    def load_embeddings(self, path=None, mmap=True):
         path = path or self.base_path / 'embeddings.npy'
-        data = np.load(path)
+        # memory-map instead of reading the whole matrix up front; pages are
+        # faulted in on first touch and shared via the OS page cache.
+        # mmap=False reads a private copy, e.g. when the file is about to be
+        # overwritten
+        data = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
         # store in instance for callers that expect attributes
         self.embeddings = data
+        # normalize once here so brute-force cosine search is a single
+        # dot product per query instead of a full pass over the corpus;
+        # an int8 copy written by the update is used as is
+        self._embeddings_unit = self._load_int8(len(data))
+        if self._embeddings_unit is None:
+            self._embeddings_unit = normalize_rows(data)
+        self._embeddings_gpu = None
+        if self.device.startswith('cuda'):
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    unit = self._embeddings_unit
+                    if isinstance(unit, QuantizedRows):
+                        unit = unit.dequantize()
+                    self._embeddings_gpu = torch.tensor(
+                        unit, dtype=torch.float16, device=self.device
+                    )
+            except Exception:
+                # no usable GPU; CPU search paths stay in charge
+                self._embeddings_gpu = None
         # try to initialize FAISS index if available. Use importlib to attempt
         # absolute imports first so this works when `src` is added to sys.path
         # (how scripts are executed in this repo).
@@ -73,17 +306,29 @@ class Storage:
                     _LocalFaiss = None
 
             if _LocalFaiss is not None:
-                self._vectorstore = _LocalFaiss(self.base_path)
+                self._vectorstore = _LocalFaiss(self.base_path, index_type=self.faiss_index)
+                fingerprint = embeddings_fingerprint(path)
                 try:
-                    # prefer loading prebuilt index
+                    # prefer loading prebuilt index, but only if it was
+                    # built from these embeddings; indexes saved without a
+                    # fingerprint are checked by size only
                     self._vectorstore.load()
+                    if len(self._vectorstore) != len(self.embeddings):
+                        raise ValueError('FAISS index does not match embeddings')
+                    if self._vectorstore.source_hash() not in (None, fingerprint):
+                        raise ValueError('FAISS index was built from other embeddings')
                 except Exception:
                     # build from embeddings in-memory
                     try:
-                        self._vectorstore.build_index(self.embeddings)
+                        # the normalized matrix is already contiguous float32,
+                        # so the build does not copy the mapped file again
+                        unit = self._embeddings_unit
+                        if isinstance(unit, QuantizedRows):
+                            unit = self.embeddings
+                        self._vectorstore.build_index(unit)
                         # attempt to save, but ignore failures
                         try:
-                            self._vectorstore.save()
+                            self._vectorstore.save(source_hash=fingerprint)
                         except Exception:
                             pass
                     except Exception:
@@ -105,14 +350,14 @@ class Storage:
                 except Exception:
                     _ChromaCls = None
 
-            if _ChromaCls is not None:
+            # only use a collection persisted next to these embeddings;
+            # opening one that is empty or stale would return wrong results
+            if _ChromaCls is not None and (self.base_path / 'chroma_db').exists():
                 try:
                     self._chroma = _ChromaCls(self.base_path)
-                    try:
-                        self._chroma.load()
-                    except Exception:
-                        # nothing to do; collection will be available after update
-                        pass
+                    self._chroma.load()
+                    if len(self._chroma) != len(self.embeddings):
+                        self._chroma = None
                 except Exception:
                     self._chroma = None
             else:
@@ -121,38 +366,54 @@ class Storage:
             self._chroma = None
         return data
 
+    def close(self):
+        """Drop references to the memory-mapped embeddings and chunk file.
+
+        Call before replacing the index files on disk (e.g. a cache sync) so
+        no mapping keeps the old file open.
+        """
+        self._close_chunks()
+        self.chunks = None
+        self.embeddings = None
+        self._embeddings_unit = None
+        self._embeddings_gpu = None
+        self._chroma = None
+
+    def _search_gpu(self, query_emb, top_k, threshold):
+        import torch
+        q = np.asarray(query_emb, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm != 0:
+            q = q / norm
+        q = torch.tensor(q, dtype=torch.float16, device=self.device)
+        scores = self._embeddings_gpu @ q
+        k = min(top_k, scores.shape[0])
+        values, indices = torch.topk(scores, k)
+        results = []
+        for score, idx in zip(values.float().cpu().tolist(), indices.cpu().tolist()):
+            if score >= threshold:
+                results.append((self.chunks[idx], float(score)))
+        return results
+
     def search(self, query_emb, top_k=5, threshold=0.3,
                use_mmr=False, fetch_k=20, lambda_param=0.5):
         """Search for relevant chunks using FAISS if available, else fallback.
 
         Returns a list of (chunk_dict, score) tuples sorted by descending score.
         """
+        # An explicitly configured GPU does exact search fastest
+        if self._embeddings_gpu is not None and not use_mmr:
+            try:
+                return self._search_gpu(query_emb, top_k, threshold)
+            except Exception:
+                pass
+
         # Prefer Chroma if present
         if hasattr(self, '_chroma') and getattr(self, '_chroma', None) is not None:
             try:
                 ids, scores = self._chroma.search(query_emb, top_k=fetch_k if use_mmr else top_k)
-                # Chroma may return distances; treat them as scores for now
-                results = []
-                for idx, score in zip(ids, scores):
-                    try:
-                        chunk = self.chunks[int(idx)]
-                    except Exception:
-                        continue
-                    if score >= threshold:
-                        results.append((chunk, float(score)))
-                # If MMR requested, rerank using full embeddings
-                if use_mmr and len(results) > 0:
-                    try:
-                        from .retriever import mmr_rerank
-                        # collect candidate embeddings and chunks
-                        cand_ids = [self.chunks.index(c) for c, _ in results]
-                        cand_embs = np.array([self.embeddings[idx] for idx in cand_ids])
-                        cand_chunks = [c for c, _ in results]
-                        return mmr_rerank(query_emb, cand_embs, cand_chunks, top_k=top_k,
-                                          fetch_k=fetch_k, lambda_param=lambda_param)
-                    except Exception:
-                        return results[:top_k]
-                return results[:top_k]
+                return self._rank_candidates(query_emb, ids, scores, top_k, threshold,
+                                             use_mmr, fetch_k, lambda_param)
             except Exception:
                 pass
 
@@ -160,74 +421,176 @@ class Storage:
         if hasattr(self, '_vectorstore') and getattr(self, '_vectorstore', None) is not None:
             try:
                 ids, scores = self._vectorstore.search(query_emb, top_k=fetch_k if use_mmr else top_k)
-                results = []
-                for idx, score in zip(ids, scores):
-                    try:
-                        chunk = self.chunks[int(idx)]
-                    except Exception:
-                        continue
-                    if score >= threshold:
-                        results.append((chunk, float(score)))
-                # MMR rerank if requested
-                if use_mmr and len(results) > 0:
-                    try:
-                        from .retriever import mmr_rerank
-                        cand_ids = [self.chunks.index(c) for c, _ in results]
-                        cand_embs = np.array([self.embeddings[idx] for idx in cand_ids])
-                        cand_chunks = [c for c, _ in results]
-                        return mmr_rerank(query_emb, cand_embs, cand_chunks, top_k=top_k,
-                                          fetch_k=fetch_k, lambda_param=lambda_param)
-                    except Exception:
-                        return results[:top_k]
-                return results[:top_k]
+                return self._rank_candidates(query_emb, ids, scores, top_k, threshold,
+                                             use_mmr, fetch_k, lambda_param)
             except Exception:
                 pass
 
         # Fallback: brute-force cosine similarity using stored embeddings
         try:
-            from .retriever import search_chunks, mmr_rerank
             if use_mmr:
                 # fetch a larger candidate set then rerank
-                candidates = search_chunks(query_emb, self.embeddings, self.chunks, top_k=fetch_k, threshold=threshold)
-                if not candidates:
-                    return []
-                cand_embs = np.array([self.embeddings[self.chunks.index(c)] for c, _ in candidates])
-                cand_chunks = [c for c, _ in candidates]
-                return mmr_rerank(query_emb, cand_embs, cand_chunks, top_k=top_k,
-                                  fetch_k=fetch_k, lambda_param=lambda_param)
+                candidates = search_chunks(query_emb, self._embeddings_unit, self.chunks, top_k=fetch_k,
+                                           threshold=threshold, normalized=True, return_indices=True)
+                ids = [idx for _, _, idx in candidates]
+                scores = [score for _, score, _ in candidates]
+                return self._rank_candidates(query_emb, ids, scores, top_k, threshold,
+                                             use_mmr, fetch_k, lambda_param)
             else:
-                return search_chunks(query_emb, self.embeddings, self.chunks, top_k=top_k, threshold=threshold)
+                return search_chunks(query_emb, self._embeddings_unit, self.chunks, top_k=top_k,
+                                     threshold=threshold, normalized=True)
         except Exception:
             return []
 
-    def acquire_lock(self, lock_path=None, timeout=7200):
-        lock_path = lock_path or self.base_path / '.update.lock'
-        if Path(lock_path).exists():
-            with open(lock_path, 'r', encoding='utf-8') as f:
-                lock_info = json.load(f)
-            lock_time = time.mktime(
-                time.strptime(lock_info['timestamp'], '%Y-%m-%dT%H:%M:%S')
-            )
-            if time.time() - lock_time > timeout:
-                # Stale lock, override
+    def _rank_candidates(self, query_emb, ids, scores, top_k, threshold,
+                         use_mmr, fetch_k, lambda_param):
+        """Turn index ids and scores into results, MMR-reranked if requested.
+
+        The ids returned by the index select the candidate embeddings
+        directly, so chunks never have to be looked up by value.
+        """
+        results = []
+        cand_ids = []
+        for idx, score in zip(ids, scores):
+            idx = int(idx)
+            # FAISS pads missing results with -1
+            if idx < 0 or score < threshold:
+                continue
+            try:
+                chunk = self.chunks[idx]
+            except Exception:
+                continue
+            results.append((chunk, float(score)))
+            cand_ids.append(idx)
+        if use_mmr and len(results) > 0:
+            try:
+                # candidate rows of the normalized matrix, so MMR only
+                # computes dot products
+                unit = self._embeddings_unit
+                if isinstance(unit, QuantizedRows):
+                    cand_embs = unit.dequantize(cand_ids)
+                else:
+                    cand_embs = unit[cand_ids]
+                cand_chunks = [c for c, _ in results]
+                return mmr_rerank(query_emb, cand_embs, cand_chunks, top_k=top_k,
+                                  fetch_k=fetch_k, lambda_param=lambda_param, normalized=True)
+            except Exception:
+                return results[:top_k]
+        return results[:top_k]
+
+    def search_batch(self, query_embs, top_k=5, threshold=0.3):
+        """Search several queries at once.
+
+        Sends all queries to Chroma or FAISS in one call when available;
+        otherwise scores them against the normalized embeddings with a
+        single matrix product. Returns one list of (chunk_dict, score)
+        tuples per query, in input order.
+        """
+        for backend in (getattr(self, '_chroma', None), getattr(self, '_vectorstore', None)):
+            if backend is None:
+                continue
+            try:
+                ids, scores = backend.search_batch(query_embs, top_k=top_k)
+                return [self._rank_candidates(None, row_ids, row_scores, top_k, threshold,
+                                              False, top_k, 0.0)
+                        for row_ids, row_scores in zip(ids, scores)]
+            except Exception:
                 pass
-            else:
-                raise RuntimeError(
-                    f"Lock held by {lock_info.get('username', 'unknown')}"
-                )
-        # Write new lock
+        try:
+            return search_chunks_batch(query_embs, self._embeddings_unit, self.chunks,
+                                       top_k=top_k, threshold=threshold, normalized=True)
+        except Exception:
+            return [[] for _ in range(len(np.atleast_2d(query_embs)))]
+
+    def acquire_lock(self, lock_path=None, timeout=7200):
+        lock_path = Path(lock_path or self.base_path / '.update.lock')
+        now = time.time()
         info = {
-            'timestamp': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+            'timestamp': datetime.datetime.fromtimestamp(now).strftime('%Y-%m-%dT%H:%M:%S'),
+            # compared against directly; the string above is for people
+            'timestamp_epoch': now,
             'username': getpass.getuser(),
             'pid': os.getpid(),
             'hostname': socket.gethostname()
         }
-        with open(lock_path, 'w', encoding='utf-8') as f:
-            json.dump(info, f)
+        for _ in range(2):
+            try:
+                # exclusive create: of two processes racing for the lock,
+                # exactly one succeeds
+                with open(lock_path, 'x', encoding='utf-8') as f:
+                    json.dump(info, f)
+                    # other hosts on the network drive should never read a
+                    # partial record
+                    _fsync_file(f)
+                return
+            except FileExistsError:
+                pass
+            lock = self._read_lock(lock_path)
+            if lock is None:
+                # released in the meantime
+                continue
+            lock_info, lock_time = lock
+            if time.time() - lock_time <= timeout:
+                raise RuntimeError(
+                    f"Lock held by {lock_info.get('username', 'unknown')}"
+                )
+            # Stale lock, override
+            self._claim_stale_lock(lock_path, lock)
+        # another process replaced the stale lock first
+        raise RuntimeError('Lock held by another process')
+
+    def _claim_stale_lock(self, lock_path, lock):
+        """Move the stale lock `lock` (as read by `_read_lock`) out of the way.
+
+        Unlinking would race: another updater may already have replaced the
+        stale lock with its own. The rename is atomic, and the moved file is
+        put back unless it is the record that was judged stale. Returns True
+        if the stale lock was removed.
+        """
+        claim = lock_path.with_name(f'{lock_path.name}.{uuid.uuid4().hex}.stale')
+        try:
+            os.rename(lock_path, claim)
+        except FileNotFoundError:
+            return False
+        if self._read_lock(claim) == lock:
+            claim.unlink(missing_ok=True)
+            return True
+        # a live lock: hand it back without replacing a lock created since
+        try:
+            os.link(claim, lock_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # no hard links on this file system
+            if not lock_path.exists():
+                os.replace(claim, lock_path)
+        claim.unlink(missing_ok=True)
+        return False
+
+    @staticmethod
+    def _read_lock(lock_path):
+        """Return (lock info, lock time) of a lock file, None if it is gone."""
+        try:
+            with open(lock_path, 'r', encoding='utf-8') as f:
+                lock_info = json.load(f)
+            if 'timestamp_epoch' in lock_info:
+                lock_time = float(lock_info['timestamp_epoch'])
+            else:
+                # written by an older version
+                lock_time = time.mktime(
+                    time.strptime(lock_info['timestamp'], '%Y-%m-%dT%H:%M:%S')
+                )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            # being written right now, or left corrupt by a crash; age it
+            # by the file itself
+            try:
+                return {}, os.stat(lock_path).st_mtime
+            except OSError:
+                return None
+        return lock_info, lock_time
 
     def release_lock(self, lock_path=None):
         lock_path = lock_path or self.base_path / '.update.lock'
-        if Path(lock_path).exists():
-            Path(lock_path).unlink()
-        if Path(lock_path).exists():
-            Path(lock_path).unlink()
+        Path(lock_path).unlink(missing_ok=True)
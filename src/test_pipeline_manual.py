@@ -31,6 +31,9 @@ embeddings = embedder.embed_chunks(all_chunks)
 storage = Storage(cache_dir)
 storage.save_chunks(all_chunks)
 storage.save_embeddings(embeddings)
+# load_chunks keeps every chunk in memory; a consumer that only writes to
+# FAISS/Chroma can use storage.iter_chunks() and embed and add them in
+# batches instead, so memory stays O(batch) rather than O(N)
 loaded_chunks = storage.load_chunks()
 loaded_embeddings = storage.load_embeddings()
 print(f"Loaded {len(loaded_chunks)} chunks, Embeddings shape: {loaded_embeddings.shape}")
@@ -40,6 +43,8 @@ query = "Wer ist Homer Simpson?"
 query_emb = embedder.model.encode([query])[0]
 scores = cosine_similarity(query_emb, loaded_embeddings)
 top_k = config['retrieval']['top_k']
-idxs = np.argsort(scores)[::-1][:top_k]
+# select the top_k in linear time, then sort only those
+idxs = np.argpartition(-scores, min(top_k, len(scores)) - 1)[:top_k]
+idxs = idxs[np.argsort(-scores[idxs])]
 for i in idxs:
     print(f"Score: {scores[i]:.3f}, Chunk: {loaded_chunks[i]['text'][:100]}...")
@@ -10,43 +10,124 @@ from pathlib import Path
 import numpy as np
 
 
+INDEX_TYPES = ('flat', 'fp16', 'sq8', 'hnsw', 'ivfpq')
+
+# HNSW graph: links per node, candidate list size while building and the
+# minimum candidate list size per query (raised to top_k when larger)
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# IVF-PQ: at most this many bytes (sub-quantizers of 8 bits) per vector,
+# inverted lists probed per query, and vectors sampled for training
+PQ_MAX_CODE_SIZE = 64
+IVF_NPROBE = 16
+IVF_TRAIN_SIZE = 100_000
+# FAISS wants 39 training points per centroid, and each PQ code book has
+# 256 centroids; smaller corpora get a 'flat' index
+PQ_MIN_VECTORS = 256 * 39
+
+
 class FaissVectorStore:
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, index_type: str = 'flat'):
         try:
             import faiss
         except Exception as e:
             raise ImportError("faiss not available") from e
 
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
         self.faiss = faiss
         self.base_path = Path(base_path)
         self.index_path = self.base_path / 'faiss.index'
+        # fingerprint of the embeddings file the index was built from
+        self.source_path = self.base_path / 'faiss.index.hash'
+        self.index_type = index_type
         self._index = None
 
+    def __len__(self):
+        """Number of vectors in the built or loaded index (0 if none)."""
+        return int(self._index.ntotal) if self._index is not None else 0
+
     def build_index(self, embeddings: np.ndarray):
         """Build an in-memory FAISS index from `embeddings`.
 
         The index uses inner-product on L2-normalized vectors to implement
-        cosine similarity.
+        cosine similarity. `index_type` selects how vectors are stored:
+        'flat' keeps float32, 'fp16' and 'sq8' use FAISS scalar quantizers
+        (2x / 4x less memory and bandwidth per query, minor score error).
+        'hnsw' builds a graph over float32 vectors that is searched in about
+        logarithmic time instead of a full scan, at slightly below exact
+        recall and a slower build. 'ivfpq' clusters the vectors and stores
+        each as at most 64 one-byte product-quantizer codes; queries scan
+        only the nearest clusters. It needs a training pass and has the
+        largest score error.
         """
         if embeddings is None or len(embeddings) == 0:
             raise ValueError("No embeddings provided to build index")
 
-        # Ensure float32
-        embs = np.array(embeddings, dtype='float32')
-        # Normalize for cosine similarity
-        norms = np.linalg.norm(embs, axis=1, keepdims=True)
-        norms[norms == 0] = 1.0
-        embs = embs / norms
+        # Ensure contiguous float32; a memory-mapped or already converted
+        # matrix is used without a copy
+        embs = np.ascontiguousarray(embeddings, dtype='float32')
+        # Normalize for cosine similarity (one copy, only if needed);
+        # einsum sums the squares without a temporary of the matrix size
+        sq = np.einsum('ij,ij->i', embs, embs)
+        if not np.allclose(sq, 1.0, atol=2e-4):
+            if embs is embeddings or not embs.flags.owndata:
+                # the caller's array or a read-only memory map
+                embs = embs.copy()
+            # in place in C; rows of zeros stay zero
+            self.faiss.normalize_L2(embs)
 
         dim = embs.shape[1]
-        index = self.faiss.IndexFlatIP(dim)
+        if self.index_type == 'flat':
+            index = self.faiss.IndexFlatIP(dim)
+        elif self.index_type == 'ivfpq':
+            index = self._ivfpq_index(embs)
+        elif self.index_type == 'hnsw':
+            index = self.faiss.IndexHNSWFlat(dim, HNSW_M, self.faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        else:
+            qtype = {
+                'fp16': self.faiss.ScalarQuantizer.QT_fp16,
+                'sq8': self.faiss.ScalarQuantizer.QT_8bit,
+            }[self.index_type]
+            index = self.faiss.IndexScalarQuantizer(dim, qtype, self.faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            # sq8 learns per-dimension ranges from the data, ivfpq its
+            # clusters and code books from a sample of it
+            step = max(1, len(embs) // IVF_TRAIN_SIZE)
+            index.train(np.ascontiguousarray(embs[::step]) if step > 1 else embs)
         index.add(embs)
         self._index = index
 
-    def save(self):
+    def _ivfpq_index(self, embs):
+        n, dim = embs.shape
+        if n < PQ_MIN_VECTORS:
+            return self.faiss.IndexFlatIP(dim)
+        # sub-quantizers must split the dimensions evenly
+        m = max(d for d in range(1, min(PQ_MAX_CODE_SIZE, dim) + 1) if dim % d == 0)
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = self.faiss.IndexFlatIP(dim)
+        return self.faiss.IndexIVFPQ(quantizer, dim, nlist, m, 8, self.faiss.METRIC_INNER_PRODUCT)
+
+    def save(self, source_hash=None):
+        """Write the index, and `source_hash` (if given) next to it so a
+        later load can tell which embeddings it was built from."""
         if self._index is None:
             raise RuntimeError('Index not built')
         self.faiss.write_index(self._index, str(self.index_path))
+        if source_hash:
+            self.source_path.write_text(source_hash, encoding='utf-8')
+        else:
+            self.source_path.unlink(missing_ok=True)
+
+    def source_hash(self):
+        """The `source_hash` saved with the index, or None."""
+        try:
+            return self.source_path.read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
 
     def load(self):
         if not self.index_path.exists():
@@ -58,16 +139,27 @@ class FaissVectorStore:
 
         `query_emb` should be a 1-D numpy array or list.
         """
+        ids, scores = self.search_batch([query_emb], top_k=top_k)
+        return ids[0], scores[0]
+
+    def search_batch(self, query_embs, top_k=5):
+        """Batched `search`: all (Q, D) queries go to FAISS in one call.
+
+        Returns (indices, scores) as lists with one list per query.
+        """
         if self._index is None:
             raise RuntimeError('Index not built or loaded')
 
-        import numpy as _np
-        q = _np.array(query_emb, dtype='float32')
-        # normalize
-        norm = _np.linalg.norm(q)
-        if norm != 0:
-            q = q / norm
-        q = q.reshape(1, -1)
+        # a copy on purpose: normalize_L2 below works in place and must not
+        # change the caller's query
+        q = np.array(np.atleast_2d(query_embs), dtype='float32')
+        self.faiss.normalize_L2(q)
+        hnsw = getattr(self._index, 'hnsw', None)
+        if hnsw is not None:
+            # the candidate list bounds both recall and the number of results
+            hnsw.efSearch = max(HNSW_EF_SEARCH, top_k)
+        if hasattr(self._index, 'nprobe'):
+            self._index.nprobe = min(IVF_NPROBE, self._index.nlist)
         distances, indices = self._index.search(q, top_k)
         # FAISS IndexFlatIP returns inner products; treat as scores
-        return indices[0].tolist(), distances[0].tolist()
+        return indices.tolist(), distances.tolist()
@@ -10,6 +10,10 @@ from typing import List, Tuple
 import numpy as np
 
 
+# chunks per collection.add call
+ADD_BATCH_SIZE = 10_000
+
+
 class ChromaVectorStore:
     def __init__(self, base_path: str, collection_name: str = 'mediawiki'):
         try:
@@ -17,27 +21,59 @@ class ChromaVectorStore:
         except Exception as e:
             raise ImportError('chromadb not available') from e
 
-        from chromadb.config import Settings
         self.chromadb = chromadb
         self.base_path = Path(base_path)
         self.persist_directory = str(self.base_path / 'chroma_db')
         self.collection_name = collection_name
-        # create client with persistence
-        self._client = chromadb.Client(Settings(persist_directory=self.persist_directory))
+        # create client with persistence; chromadb >= 0.4 only persists
+        # through PersistentClient
+        if hasattr(chromadb, 'PersistentClient'):
+            self._client = chromadb.PersistentClient(path=self.persist_directory)
+        else:
+            from chromadb.config import Settings
+            self._client = chromadb.Client(Settings(persist_directory=self.persist_directory))
         # get or create collection
         try:
             self._collection = self._client.get_collection(self.collection_name)
         except Exception:
-            self._collection = self._client.create_collection(self.collection_name)
+            self._collection = self._create_collection()
+
+    def _create_collection(self):
+        # cosine space so distances convert to the same scores FAISS returns
+        return self._client.create_collection(self.collection_name, metadata={'hnsw:space': 'cosine'})
+
+    def __len__(self):
+        """Number of vectors stored in the collection."""
+        return int(self._collection.count())
 
     def build_index(self, embeddings: np.ndarray, chunks: List[dict]):
+        # start from an empty collection so rebuilding never mixes versions
+        try:
+            self._client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+        self._collection = self._create_collection()
         # prepare ids, metadatas and documents
         ids = [str(i) for i in range(len(chunks))]
         metadatas = [{'page_title': c.get('page_title'), 'chunk_index': c.get('chunk_index')} for c in chunks]
         documents = [c.get('text', '') for c in chunks]
-        embs = [list(map(float, e)) for e in np.array(embeddings, dtype='float32')]
-        # add to collection
-        self._collection.add(ids=ids, metadatas=metadatas, documents=documents, embeddings=embs)
+        embs = np.ascontiguousarray(embeddings, dtype='float32')
+        # add to collection in batches: the client rejects batches above its
+        # maximum
+        batch_size = ADD_BATCH_SIZE
+        if hasattr(self._client, 'get_max_batch_size'):
+            batch_size = min(batch_size, self._client.get_max_batch_size())
+        for start in range(0, len(ids), batch_size):
+            stop = start + batch_size
+            batch = dict(ids=ids[start:stop], metadatas=metadatas[start:stop],
+                         documents=documents[start:stop])
+            try:
+                # current chromadb takes the array as is, without a Python
+                # float object per value
+                self._collection.add(embeddings=embs[start:stop], **batch)
+            except ValueError:
+                # older releases only accept lists
+                self._collection.add(embeddings=embs[start:stop].tolist(), **batch)
         # persist
         try:
             self._client.persist()
@@ -46,16 +82,33 @@ class ChromaVectorStore:
 
     def load(self):
         # client initialized in __init__, collection should already be available
-        try:
-            self._collection = self._client.get_collection(self.collection_name)
-        except Exception:
-            self._collection = self._client.create_collection(self.collection_name)
+        self._collection = self._client.get_collection(self.collection_name)
 
     def search(self, query_emb, top_k=5) -> Tuple[List[int], List[float]]:
-        q = list(map(float, np.array(query_emb, dtype='float32')))
-        res = self._collection.query(query_embeddings=[q], n_results=top_k)
-        # chroma returns dict with 'ids' and 'distances' lists
-        ids = [int(x) for x in res.get('ids', [[]])[0]]
-        distances = res.get('distances', [[]])[0]
-        # depending on chroma settings, distances may be similarity or distance
-        return ids, distances
+        """Return (indices, scores) for the top_k nearest neighbors.
+
+        Chroma reports distances; they are converted to cosine similarity
+        so callers can apply the same threshold as for the other backends.
+        """
+        ids, scores = self.search_batch([query_emb], top_k=top_k)
+        return ids[0], scores[0]
+
+    def search_batch(self, query_embs, top_k=5) -> Tuple[List[List[int]], List[List[float]]]:
+        """Batched `search`: one Chroma query for all (Q, D) queries."""
+        qs = np.atleast_2d(np.asarray(query_embs, dtype='float32')).tolist()
+        res = self._collection.query(query_embeddings=qs, n_results=top_k)
+        space = (self._collection.metadata or {}).get('hnsw:space', 'l2')
+        # chroma returns dict with 'ids' and 'distances' lists, one per query
+        id_rows = res.get('ids') or [[] for _ in qs]
+        distance_rows = res.get('distances') or [[] for _ in qs]
+        all_ids, all_scores = [], []
+        for ids, distances in zip(id_rows, distance_rows):
+            if space == 'l2':
+                # squared L2 between unit vectors is 2 - 2 * cos
+                scores = [1.0 - float(d) / 2.0 for d in distances]
+            else:
+                # 'cosine' and 'ip' distances are 1 - similarity
+                scores = [1.0 - float(d) for d in distances]
+            all_ids.append([int(x) for x in ids])
+            all_scores.append(scores)
+        return all_ids, all_scores
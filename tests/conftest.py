@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# the embedder tests load (and on first use download) the sentence-transformer
+# model; they only run with WIKIRAG_MODEL_TESTS=1
+MODEL_TESTS_ENV = 'WIKIRAG_MODEL_TESTS'
+
+
+@pytest.fixture(scope='session')
+def embedder():
+    """One Embedder shared by every test of the run."""
+    if os.environ.get(MODEL_TESTS_ENV) != '1':
+        pytest.skip(f'set {MODEL_TESTS_ENV}=1 to run tests that load the embedding model')
+    pytest.importorskip('sentence_transformers')
+    from embedder import Embedder
+    return Embedder()
+
+
+@pytest.fixture(scope='session')
+def sample_chunks():
+    from chunker import chunk_text
+    page = {
+        'title': 'TestPage',
+        'content': 'Dies ist ein Beispieltext. ' * 100,
+    }
+    return chunk_text(page, chunk_size=800, overlap=150)
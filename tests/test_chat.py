@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+from chat import stream_answer
+from llm import LLMError, OllamaAdapter
+
+LLM_KWARGS = dict(chunks=['Quelle: P\ntext\n'], prompt_template='{context}\n{question}', question='Frage?')
+
+
+def _adapter(parts):
+    class FakeClient:
+        def generate(self, model, prompt, stream=False):
+            for part in parts:
+                if isinstance(part, Exception):
+                    raise part
+                yield {'response': part}
+
+    llm = OllamaAdapter(model_name='test')
+    llm._client = FakeClient()
+    return llm
+
+
+def test_stream_answer_keeps_partial_answer_when_server_fails(capsys):
+    llm = _adapter(['Homer arbeitet', ConnectionError('reset')])
+    answer = stream_answer(llm, LLM_KWARGS)
+    out = capsys.readouterr().out
+    assert answer == 'Homer arbeitet'
+    assert out.count('Antwort:') == 1
+    assert '\n[Antwort unvollständig: ' in out
+    assert out.endswith('\n')
+
+
+def test_stream_answer_raises_before_first_piece(capsys):
+    llm = _adapter([ConnectionError('refused')])
+    with pytest.raises(LLMError):
+        stream_answer(llm, LLM_KWARGS)
+    # nothing printed, so the caller's fallback gets the only heading
+    assert capsys.readouterr().out == ''
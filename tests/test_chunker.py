@@ -8,3 +8,11 @@ def test_chunk_text_basic():
     chunks = chunk_text(page, chunk_size=800, overlap=150)
     assert len(chunks) > 1
     assert all('text' in c and 'page_title' in c for c in chunks)
+
+
+def test_chunk_ids_depend_only_on_text():
+    content = "Erster Absatz.\n\nZweiter Absatz."
+    a = chunk_text({'title': 'Alt', 'content': content}, chunk_size=20, overlap=0)
+    b = chunk_text({'title': 'Neu', 'content': 'Vorwort.\n\n' + content}, chunk_size=20, overlap=0)
+    assert [c['id'] for c in a] == [c['id'] for c in b[1:]]
+    assert len({c['id'] for c in b}) == len(b)
@@ -28,3 +28,16 @@ def test_chunk_basic_repeat_chars():
     chunks = chunk_text(page, chunk_size=800, overlap=150)
     assert len(chunks) > 1
     assert all('text' in c and 'page_title' in c for c in chunks)
+
+
+def test_chunk_fixed_size_fallback_covers_text_once():
+    page = {'title': 'Long', 'content': 'A' * 2000}
+    chunks = chunk_text(page, chunk_size=800, overlap=150)
+    # windows start at 0, 650 and 1300; the last one reaches the end
+    assert [c['char_count'] for c in chunks] == [800, 800, 700]
+
+
+def test_chunk_fixed_size_fallback_with_overlap_not_smaller_than_size():
+    page = {'title': 'Long', 'content': 'B' * 1000}
+    chunks = chunk_text(page, chunk_size=300, overlap=300)
+    assert ''.join(c['text'] for c in chunks) == 'B' * 1000
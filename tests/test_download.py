@@ -10,6 +10,9 @@ def test_ensure_model_download(tmp_path, monkeypatch):
     sha = hashlib.sha256(content).hexdigest()
 
     class FakeResponse:
+        status_code = 200
+        headers = {}
+
         def __init__(self, data):
             self.data = data
 
@@ -25,7 +28,7 @@ def test_ensure_model_download(tmp_path, monkeypatch):
         def __exit__(self, exc_type, exc, tb):
             return False
 
-    def fake_get(url, stream=True, timeout=30):
+    def fake_get(url, stream=True, timeout=30, headers=None):
         return FakeResponse(content)
 
     monkeypatch.setattr('requests.get', fake_get)
@@ -39,3 +42,134 @@ def test_ensure_model_download(tmp_path, monkeypatch):
     with open(path, 'rb') as f:
         data = f.read()
     assert hashlib.sha256(data).hexdigest() == sha
+
+
+def test_ensure_model_resumes_partial_download(tmp_path):
+    content = b"hello-model"
+    sha = hashlib.sha256(content).hexdigest()
+    requested = []
+
+    class FakeResponse:
+        status_code = 206
+        headers = {}
+
+        def __init__(self, data):
+            self.data = data
+
+        def raise_for_status(self):
+            return None
+
+        def iter_content(self, chunk_size=8192):
+            yield self.data
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, tb):
+            return False
+
+    class FakeSession:
+        def get(self, url, stream=True, timeout=30, headers=None):
+            requested.append(headers.get('Range'))
+            start = int(headers['Range'][len('bytes='):-1])
+            return FakeResponse(content[start:])
+
+    from src.download import ensure_model
+
+    dest = tmp_path / "model.bin"
+    (tmp_path / "model.bin.tmp").write_bytes(content[:5])
+    path = ensure_model(str(dest), "http://example.com/model.bin", sha256=sha,
+                        session=FakeSession())
+    assert requested == ['bytes=5-']
+    assert Path(path).read_bytes() == content
+    assert not (tmp_path / "model.bin.tmp").exists()
+
+
+class _Response:
+    def __init__(self, status_code, data=b'', headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size=8192):
+        yield self.data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Server:
+    """Serves `content` with `etag`, honouring Range and If-Range."""
+
+    def __init__(self, content, etag):
+        self.content = content
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, stream=True, timeout=30, headers=None):
+        self.requests.append(dict(headers))
+        rng = headers.get('Range')
+        if rng and headers.get('If-Range', self.etag) == self.etag:
+            start = int(rng[len('bytes='):-1])
+            if start >= len(self.content):
+                return _Response(416)
+            return _Response(206, self.content[start:], {'ETag': self.etag})
+        return _Response(200, self.content, {'ETag': self.etag})
+
+
+class _Interrupted(_Response):
+    def iter_content(self, chunk_size=8192):
+        yield self.data
+        raise IOError('connection reset')
+
+
+def test_ensure_model_resume_restarts_when_file_changed(tmp_path):
+    from src.download import ensure_model, DownloadError
+
+    class Session:
+        def get(self, url, stream=True, timeout=30, headers=None):
+            return _Interrupted(200, b"old-", {'ETag': '"v1"'})
+
+    dest = tmp_path / "model.bin"
+    with pytest.raises(DownloadError):
+        ensure_model(str(dest), "http://example.com/model.bin", session=Session())
+    assert (tmp_path / "model.bin.tmp").read_bytes() == b"old-"
+
+    # the file changed on the server before the resume
+    server = _Server(b"new-model-v2", '"v2"')
+    path = ensure_model(str(dest), "http://example.com/model.bin", session=server)
+    assert server.requests[0]['If-Range'] == '"v1"'
+    # the new file replaced the partial one instead of being appended
+    assert Path(path).read_bytes() == b"new-model-v2"
+    assert not (tmp_path / "model.bin.tmp.validator").exists()
+
+
+def test_ensure_model_416_without_checksum_downloads_again(tmp_path):
+    from src.download import ensure_model
+
+    dest = tmp_path / "model.bin"
+    (tmp_path / "model.bin.tmp").write_bytes(b"stale-and-longer-than-remote")
+    (tmp_path / "model.bin.tmp.validator").write_text('"v1"')
+    server = _Server(b"model", '"v1"')
+    path = ensure_model(str(dest), "http://example.com/model.bin", session=server)
+    assert [r.get('Range') for r in server.requests] == ['bytes=28-', None]
+    assert Path(path).read_bytes() == b"model"
+
+
+def test_ensure_model_416_with_matching_checksum_is_complete(tmp_path):
+    from src.download import ensure_model
+
+    content = b"hello-model"
+    dest = tmp_path / "model.bin"
+    (tmp_path / "model.bin.tmp").write_bytes(content)
+    server = _Server(content, '"v1"')
+    path = ensure_model(str(dest), "http://example.com/model.bin",
+                        sha256=hashlib.sha256(content).hexdigest(), session=server)
+    assert len(server.requests) == 1
+    assert Path(path).read_bytes() == content
@@ -1,8 +1,21 @@
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
-from embedder import Embedder
+import numpy as np
 
-def test_embedder_init():
-    embedder = Embedder()
+
+def test_embedder_init(embedder):
     assert embedder.model is not None
+
+
+def test_embed_chunks_returns_unit_float32_rows(embedder, sample_chunks):
+    embeddings = embedder.embed_chunks(sample_chunks[:2])
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape[0] == 2
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-4)
+
+
+def test_retrieval_ranks_matching_chunk_first(embedder, sample_chunks):
+    from retriever import search_chunks
+    chunks = sample_chunks + [{'text': 'Homer Simpson arbeitet im Atomkraftwerk von Springfield.'}]
+    embeddings = embedder.embed_chunks(chunks)
+    query_emb = embedder.embed('Wo arbeitet Homer Simpson?')
+    results = search_chunks(query_emb, embeddings, chunks, top_k=2, threshold=0.0)
+    assert results[0][0] is chunks[-1]
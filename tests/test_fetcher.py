@@ -7,3 +7,100 @@ from fetcher import MediaWikiFetcher
 def test_fetcher_init():
     fetcher = MediaWikiFetcher('https://example.com/api.php')
     assert fetcher.api_url == 'https://example.com/api.php'
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self._data = data
+        self.headers = {}
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def test_fetch_all_pages_follows_revision_continuation(monkeypatch):
+    import fetcher as fetcher_mod
+    # first response: two pages but content only for one, continued via rvcontinue
+    responses = [
+        {'continue': {'rvcontinue': '2|20', 'continue': 'gapcontinue||'},
+         'query': {'pages': [
+             {'title': 'A', 'revisions': [{'revid': 1, 'timestamp': 't1',
+                                           'slots': {'main': {'content': 'Alpha'}}}]},
+             {'title': 'B'},
+         ]}},
+        {'query': {'pages': [
+            {'title': 'A'},
+            {'title': 'B', 'revisions': [{'revid': 2, 'timestamp': 't2',
+                                          'slots': {'main': {'content': 'Beta'}}}]},
+        ]}},
+    ]
+    seen = []
+
+    class FakeSession:
+        def get(self, url, params=None, timeout=None):
+            seen.append(dict(params))
+            return _FakeResponse(responses[len(seen) - 1])
+
+    monkeypatch.setattr(fetcher_mod.requests, 'Session', FakeSession)
+    pages = MediaWikiFetcher('https://example.com/api.php').fetch_all_pages()
+    assert [(p['title'], p['content'], p['revid']) for p in pages] == [
+        ('A', 'Alpha', 1), ('B', 'Beta', 2)]
+    assert seen[1]['rvcontinue'] == '2|20'
+
+
+def test_fetch_all_pages_concurrent_fetches_listed_titles(monkeypatch):
+    import fetcher as fetcher_mod
+    posted = []
+
+    class FakeSession:
+        def mount(self, prefix, adapter):
+            pass
+
+        def get(self, url, params=None, timeout=None):
+            assert params['list'] == 'allpages'
+            return _FakeResponse({'query': {'allpages': [{'title': t} for t in 'ABC']}})
+
+        def post(self, url, data=None, timeout=None):
+            titles = data['titles'].split('|')
+            posted.append(titles)
+            return _FakeResponse({'query': {'pages': [
+                {'title': t, 'revisions': [{'revid': ord(t), 'timestamp': 't',
+                                            'slots': {'main': {'content': t.lower()}}}]}
+                for t in titles]}})
+
+    monkeypatch.setattr(fetcher_mod.requests, 'Session', FakeSession)
+    pages = MediaWikiFetcher('https://example.com/api.php').fetch_all_pages(
+        batch_size=2, max_workers=2)
+    assert sorted(posted) == [['A', 'B'], ['C']]
+    assert [(p['title'], p['content']) for p in pages] == [('A', 'a'), ('B', 'b'), ('C', 'c')]
+
+
+def test_clean_content_strips_markup():
+    raw = (
+        "Intro<ref name=\"a\">cite</ref> text.<ref name=\"b\" />\n"
+        "== Heading ==\n"
+        "[[File:Homer.png|thumb]]Body <b>bold</b> {{file:x.png}}\n\n\n\n"
+        "<references>\nlist\n</references>\n<REFERENCES />End"
+    )
+    cleaned = MediaWikiFetcher('https://example.com/api.php').clean_content(raw)
+    assert cleaned == "Intro text.\n\nBody bold \n\nEnd"
+
+
+def test_list_revisions_requests_no_content(monkeypatch):
+    import fetcher as fetcher_mod
+    seen = []
+
+    class FakeSession:
+        def get(self, url, params=None, timeout=None):
+            seen.append(dict(params))
+            return _FakeResponse({'query': {'pages': [
+                {'title': 'A', 'revisions': [{'revid': 7, 'timestamp': 't7'}]}]}})
+
+    monkeypatch.setattr(fetcher_mod.requests, 'Session', FakeSession)
+    revisions = MediaWikiFetcher('https://example.com/api.php').list_revisions()
+    assert revisions == [{'title': 'A', 'revid': 7, 'timestamp': 't7'}]
+    assert 'content' not in seen[0]['rvprop']
@@ -379,3 +379,116 @@ def test_ollama_adapter_empty_response_triggers_error(monkeypatch):
     import pytest
     with pytest.raises(LLMError):
         _ = llm.generate("empty response test")
+
+
+def test_ollama_adapter_semantic_cache():
+    from src.llm import OllamaAdapter
+
+    calls = []
+
+    class FakeClient:
+        def generate(self, model, prompt):
+            calls.append(prompt)
+            return {"response": f"answer {len(calls)}"}
+
+    vectors = {"Wie alt ist Homer?": [1.0, 0.0], "Wie alt ist Homer Simpson?": [0.99, 0.05],
+               "Wer ist Marge?": [0.0, 1.0]}
+    llm = OllamaAdapter(model_name="m", cache_size=2, embed_fn=vectors.get)
+    llm._client = FakeClient()
+
+    ask = lambda q: llm.generate_from_chunks(["ctx"], "{context} {question}", q)
+    assert ask("Wie alt ist Homer?") == "answer 1"
+    # identical prompt, then a near-duplicate question
+    assert ask("Wie alt ist Homer?") == "answer 1"
+    assert ask("Wie alt ist Homer Simpson?") == "answer 1"
+    assert ask("Wer ist Marge?") == "answer 2"
+    assert len(calls) == 2
+
+    # disabled by default
+    uncached = OllamaAdapter(model_name="m")
+    uncached._client = FakeClient()
+    uncached.generate("x")
+    uncached.generate("x")
+    assert uncached.cache is None and len(calls) == 4
+
+
+def test_ollama_client_keeps_connections_alive(monkeypatch):
+    created = []
+
+    class FakeClient:
+        def __init__(self, host, **kwargs):
+            created.append(kwargs)
+
+    fake_mod = type(sys)('ollama')
+    fake_mod.Client = FakeClient
+    monkeypatch.setitem(sys.modules, 'ollama', fake_mod)
+
+    from src.llm import OllamaAdapter, OLLAMA_KEEPALIVE_EXPIRY
+
+    OllamaAdapter(model_name="m")._load()
+    assert created[0]['limits'].keepalive_expiry == OLLAMA_KEEPALIVE_EXPIRY
+
+
+def test_ollama_adapter_streams_and_caches_answer():
+    from src.llm import OllamaAdapter
+
+    class FakeClient:
+        def generate(self, model, prompt, stream=False):
+            assert stream
+            return iter([{"response": "Homer "}, {"response": ""}, {"response": "ist 39."}])
+
+    llm = OllamaAdapter(model_name="m", cache_size=4)
+    llm._client = FakeClient()
+    pieces = list(llm.generate_from_chunks_stream(["ctx"], "{context} {question}", "Alter?"))
+    assert pieces == ["Homer ", "ist 39."]
+    # the joined answer is cached; no stream=False call reaches the client
+    assert llm.generate_from_chunks(["ctx"], "{context} {question}", "Alter?") == "Homer ist 39."
+
+
+def test_gpt4all_preload_loads_model_once(monkeypatch):
+    import threading
+    import time
+    created = []
+    release = threading.Event()
+
+    class FakeGPT4All:
+        def __init__(self, *a, **kw):
+            release.wait(5)
+            created.append(1)
+
+        def generate(self, prompt, *a, **kw):
+            return "ok"
+
+    fake_mod = type(sys)('gpt4all')
+    fake_mod.GPT4All = FakeGPT4All
+    monkeypatch.setitem(sys.modules, 'gpt4all', fake_mod)
+
+    from src.llm import get_llm
+
+    cfg = {'models': {'llm': {'enabled': True, 'provider': 'gpt4all',
+                              'model_path': 'm.gguf', 'auto_download': False}}}
+    llm = get_llm(cfg, validate=False, preload=True)
+    time.sleep(0.05)
+    assert created == []
+    release.set()
+    # waits for the background load instead of starting a second one
+    assert llm.generate("Hallo") == "ok"
+    assert created == [1]
+
+
+def test_gpt4all_drops_lowest_ranked_chunks_beyond_n_ctx():
+    from src.llm import GPT4AllAdapter
+
+    prompts = []
+
+    class FakeModel:
+        def generate(self, prompt, **kw):
+            prompts.append(prompt)
+            return "ok"
+
+    llm = GPT4AllAdapter(model_path="m", n_ctx=300, max_tokens=100)
+    llm._model = FakeModel()
+    chunks = ["a" * 200, "b" * 200, "c" * 200]
+    llm.generate_from_chunks(chunks, "{context}\n{question}", "Frage?")
+    # (300 - 100 - 64) tokens * 4 characters leave room for two chunks
+    assert "b" * 200 in prompts[0] and "c" not in prompts[0]
@@ -0,0 +1,21 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from prompts import compile_prompt, load_prompt
+
+
+def test_compile_prompt_matches_format():
+    for template in ("{context}\n\nFrage: {question}\n\nAntwort:",
+                     "Literal {{braces}} {question} {context}{context}",
+                     "{context!r} {question:>5}"):
+        expected = template.format(context='Homer', question='Alter?')
+        assert compile_prompt(template)('Homer', 'Alter?') == expected
+
+
+def test_load_prompt_rereads_changed_file(tmp_path):
+    path = tmp_path / 'prompt.txt'
+    path.write_text('eins {question}', encoding='utf-8')
+    assert load_prompt(str(path)) == 'eins {question}'
+    path.write_text('zwei {question}', encoding='utf-8')
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert load_prompt(str(path)) == 'zwei {question}'
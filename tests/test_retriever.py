@@ -0,0 +1,120 @@
+import sys
+import os
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from retriever import search_chunks, normalize_rows
+
+
+def _sample():
+    rng = np.random.default_rng(0)
+    embs = rng.normal(size=(50, 8)).astype(np.float32)
+    chunks = [{'id': f'c{i}', 'text': str(i)} for i in range(len(embs))]
+    return embs, chunks
+
+
+def test_normalize_rows_unit_length_and_zero_rows():
+    embs = np.array([[3.0, 4.0], [0.0, 0.0]])
+    unit = normalize_rows(embs)
+    assert unit.dtype == np.float32
+    assert np.allclose(unit[0], [0.6, 0.8])
+    assert np.all(unit[1] == 0)
+
+
+def test_search_chunks_normalized_matches_cosine():
+    embs, chunks = _sample()
+    query = embs[7] * 3.0
+    plain = search_chunks(query, embs, chunks, top_k=5, threshold=-1.0)
+    fast = search_chunks(query, normalize_rows(embs), chunks, top_k=5, threshold=-1.0, normalized=True)
+    assert [c['id'] for c, _ in plain] == [c['id'] for c, _ in fast]
+    assert fast[0][0]['id'] == 'c7'
+    assert np.allclose([s for _, s in plain], [s for _, s in fast], atol=1e-5)
+
+
+def test_search_chunks_top_k_order_and_threshold():
+    embs, chunks = _sample()
+    query = embs[3]
+    results = search_chunks(query, embs, chunks, top_k=4, threshold=-1.0)
+    scores = [s for _, s in results]
+    assert len(results) == 4
+    assert results[0][0]['id'] == 'c3'
+    assert scores == sorted(scores, reverse=True)
+    # a threshold above every score but the exact match keeps only that one
+    assert [c['id'] for c, _ in search_chunks(query, embs, chunks, top_k=4, threshold=0.999)] == ['c3']
+
+
+def test_cosine_similarity_matches_reference():
+    from retriever import cosine_similarity
+    embs, _ = _sample()
+    embs[4] = 0.0
+    query = embs[2]
+    expected = embs @ query / np.maximum(np.linalg.norm(embs, axis=1) * np.linalg.norm(query), 1e-12)
+    assert np.allclose(cosine_similarity(query, embs), expected, atol=1e-5)
+    assert np.allclose(cosine_similarity(query, normalize_rows(embs), normalized=True), expected, atol=1e-5)
+
+
+def test_cosine_rows_kernel_matches_reference():
+    import pytest
+    import retriever
+    if retriever._cosine_rows is None:
+        pytest.skip('numba not installed')
+    embs, _ = _sample()
+    embs[4] = 0.0
+    query = embs[2]
+    expected = embs @ query / np.maximum(np.linalg.norm(embs, axis=1) * np.linalg.norm(query), 1e-12)
+    out = np.empty(len(embs), dtype=np.float32)
+    retriever._cosine_rows(query, embs, out)
+    assert np.allclose(out, expected, atol=1e-5)
+
+
+def test_search_chunks_batch_matches_single_queries():
+    from retriever import search_chunks_batch
+    embs, chunks = _sample()
+    queries = embs[[1, 9, 20]]
+    batch = search_chunks_batch(queries, embs, chunks, top_k=3, threshold=-1.0)
+    assert len(batch) == 3
+    for query, results in zip(queries, batch):
+        single = search_chunks(query, embs, chunks, top_k=3, threshold=-1.0)
+        assert [c['id'] for c, _ in results] == [c['id'] for c, _ in single]
+
+
+def _reference_mmr(sims, pairwise, top_k, lam):
+    # the straightforward formulation: recompute redundancy for every candidate
+    picks = [0]
+    while len(picks) < min(top_k, len(sims)):
+        rest = [i for i in range(len(sims)) if i not in picks]
+        picks.append(max(rest, key=lambda i: lam * sims[i] - (1 - lam) * max(pairwise[i, p] for p in picks)))
+    return picks
+
+
+def test_mmr_select_matches_reference():
+    from retriever import _mmr_select
+    embs, _ = _sample()
+    unit = normalize_rows(embs[:20])
+    unit = unit[np.argsort(-(unit @ unit[0]))]
+    sims = unit @ unit[0]
+    pairwise = np.ascontiguousarray(unit @ unit.T)
+    # the uncompiled function is the fallback without numba
+    python_select = getattr(_mmr_select, 'py_func', _mmr_select)
+    for lam in (0.0, 0.5, 1.0):
+        expected = _reference_mmr(sims, pairwise, 6, lam)
+        assert list(_mmr_select(sims, pairwise, 6, lam)) == expected
+        assert list(python_select(sims, pairwise, 6, lam)) == expected
+
+
+def test_mmr_rerank_skips_duplicates():
+    from retriever import mmr_rerank
+    embs = np.array([[1.0, 0.0], [1.0, 0.0], [0.8, 0.6]], dtype=np.float32)
+    chunks = [{'id': 'a'}, {'id': 'a2'}, {'id': 'b'}]
+    results = mmr_rerank(np.array([1.0, 0.1]), embs, chunks, top_k=2, lambda_param=0.3)
+    assert [c['id'] for c, _ in results] == ['a', 'b']
+
+
+def test_quantized_rows_scores_close_to_float():
+    from retriever import QuantizedRows
+    embs, _ = _sample()
+    quantized = QuantizedRows.from_float(embs)
+    quantized.block_rows = 16
+    unit = normalize_rows(embs)
+    queries = unit[[0, 3]]
+    assert np.allclose(quantized.dot(queries[0]), unit @ queries[0], atol=0.02)
+    assert np.allclose(quantized.dot(queries), queries @ unit.T, atol=0.02)
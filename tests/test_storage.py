@@ -1,14 +1,264 @@
-import tempfile
+import json
 import os
 import sys
-import os
+
+import numpy as np
+import pytest
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 from storage import Storage
 
-def test_storage_save_load_chunks():
-    with tempfile.TemporaryDirectory() as tmpdir:
-        storage = Storage(tmpdir)
-        chunks = [{'id': 'c1', 'text': 'abc', 'page_title': 'Test', 'chunk_index': 0, 'char_count': 3}]
-        storage.save_chunks(chunks)
-        loaded = storage.load_chunks()
-        assert loaded[0]['id'] == 'c1'
+
+@pytest.fixture
+def storage(tmp_path):
+    """Storage over an empty index directory, closed after the test."""
+    s = Storage(str(tmp_path))
+    yield s
+    s.close()
+
+
+def test_storage_save_load_chunks(storage):
+    chunks = [{'id': 'c1', 'text': 'abc', 'page_title': 'Test', 'chunk_index': 0, 'char_count': 3}]
+    storage.save_chunks(chunks)
+    loaded = storage.load_chunks()
+    assert loaded[0]['id'] == 'c1'
+
+
+def test_storage_search_uses_normalized_embeddings(storage):
+    chunks = [{'id': f'c{i}', 'text': str(i)} for i in range(3)]
+    embs = np.array([[10.0, 0.0], [0.0, 2.0], [1.0, 1.0]], dtype=np.float32)
+    storage.save_chunks(chunks)
+    storage.save_embeddings(embs)
+    storage.load_chunks()
+    storage.load_embeddings()
+    assert np.allclose(np.linalg.norm(storage._embeddings_unit, axis=1), 1.0)
+    results = storage.search(np.array([0.0, 5.0]), top_k=1, threshold=0.0)
+    assert results[0][0]['id'] == 'c1'
+
+
+def test_load_embeddings_memory_maps_and_reuses_unit_rows(storage):
+    embs = np.eye(4, dtype=np.float32)
+    storage.save_embeddings(embs)
+    loaded = storage.load_embeddings()
+    assert isinstance(loaded, np.memmap)
+    # rows are already unit length, so no normalized copy is made
+    assert np.shares_memory(storage._embeddings_unit, loaded)
+    storage.close()
+    assert storage.embeddings is None
+
+
+def test_load_embeddings_rebuilds_stale_faiss_index(storage, tmp_path):
+    pytest.importorskip('faiss')
+    from vectorstore import FaissVectorStore
+    stale = FaissVectorStore(str(tmp_path))
+    stale.build_index(np.eye(3, dtype=np.float32))
+    stale.save()
+    storage.save_embeddings(np.eye(5, dtype=np.float32))
+    storage.load_embeddings()
+    assert len(storage._vectorstore) == 5
+
+
+def test_load_embeddings_mmap_opt_out(storage):
+    embs = np.eye(3, dtype=np.float32)
+    storage.save_embeddings(embs)
+    assert isinstance(storage.load_embeddings(), np.memmap)
+    loaded = storage.load_embeddings(mmap=False)
+    assert not isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, embs)
+
+
+def test_load_chunks_keeps_non_ascii_text(storage):
+    chunks = [{'id': 'c1', 'text': 'Grüße aus Springfield', 'page_title': 'Über'}]
+    storage.save_chunks(chunks)
+    assert storage.load_chunks() == chunks
+
+
+def test_iter_chunks_streams_rows(storage, tmp_path):
+    chunks = [{'id': f'c{i}', 'text': str(i)} for i in range(3)]
+    storage.save_chunks(chunks)
+    with open(tmp_path / 'chunks.jsonl', 'ab') as f:
+        f.write(b'\n')
+    it = storage.iter_chunks()
+    assert next(it) == chunks[0]
+    assert list(it) == chunks[1:]
+    assert storage.chunks is None
+
+
+def test_load_embeddings_uses_only_matching_chroma_collection(storage, tmp_path):
+    pytest.importorskip('chromadb')
+    from vectorstore_chroma import ChromaVectorStore
+    chunks = [{'text': f't{i}', 'page_title': 'P', 'chunk_index': i} for i in range(5)]
+    embs = np.eye(5, dtype=np.float32)
+    storage.save_chunks(chunks)
+    storage.save_embeddings(embs)
+    storage.load_chunks()
+    storage.load_embeddings()
+    # no persisted collection: never fall back to an empty one
+    assert storage._chroma is None
+    storage.close()
+
+    ChromaVectorStore(str(tmp_path)).build_index(embs, chunks)
+    storage.load_chunks()
+    storage.load_embeddings()
+    assert storage._chroma is not None
+    results = storage.search(embs[2], top_k=1, threshold=0.5)
+    assert results[0][0]['text'] == 't2'
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    storage.close()
+
+    storage.save_embeddings(np.eye(5, 6, dtype=np.float32)[:4])
+    storage.load_embeddings()
+    assert storage._chroma is None
+
+
+def test_chroma_build_index_adds_in_batches(tmp_path, monkeypatch):
+    pytest.importorskip('chromadb')
+    import vectorstore_chroma
+    monkeypatch.setattr(vectorstore_chroma, 'ADD_BATCH_SIZE', 2)
+    chunks = [{'text': f't{i}', 'page_title': 'P', 'chunk_index': i} for i in range(5)]
+    embs = np.eye(5, dtype=np.float32)
+    cvs = vectorstore_chroma.ChromaVectorStore(str(tmp_path), collection_name='batched')
+    cvs.build_index(embs, chunks)
+    assert len(cvs) == 5
+    ids, scores = cvs.search(embs[4], top_k=1)
+    assert ids == [4]
+
+
+def test_load_chunks_lazy_reads_rows_on_demand(storage):
+    chunks = [{'id': f'c{i}', 'text': f'Grüße {i}', 'page_title': 'P'} for i in range(4)]
+    storage.save_chunks(chunks)
+    lazy = storage.load_chunks(lazy=True)
+    assert len(lazy) == 4
+    assert lazy[2] == chunks[2]
+    assert lazy[-1] == chunks[3]
+    assert list(lazy) == chunks
+    assert lazy.index(lazy[1]) == 1
+
+
+def test_load_chunks_lazy_ignores_stale_offsets(storage, tmp_path):
+    storage.save_chunks([{'id': 'c1', 'text': 'abc'}])
+    with open(tmp_path / 'chunks.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"id": "c2", "text": "def"}\n')
+    loaded = storage.load_chunks(lazy=True)
+    assert isinstance(loaded, list)
+    assert [c['id'] for c in loaded] == ['c1', 'c2']
+
+
+def test_storage_search_with_float16_embeddings(storage):
+    chunks = [{'id': f'c{i}', 'text': f't{i}'} for i in range(3)]
+    storage.save_chunks(chunks)
+    storage.save_embeddings(np.eye(3, dtype=np.float16) * 2)
+    storage.load_chunks()
+    storage.load_embeddings()
+    assert storage.embeddings.dtype == np.float16
+    results = storage.search(np.array([0, 1, 0], dtype=np.float32), top_k=1)
+    assert results[0][0]['id'] == 'c1'
+    assert abs(results[0][1] - 1.0) < 1e-3
+
+
+def test_storage_search_mmr_maps_ids_to_chunks(storage):
+    chunks = [{'id': c, 'text': c} for c in ('x', 'a', 'a2', 'b')]
+    embs = np.array([[0.0, 1.0], [1.0, 0.0], [1.0, 0.0], [0.8, 0.6]], dtype=np.float32)
+    storage.save_chunks(chunks)
+    storage.save_embeddings(embs)
+    storage.load_chunks(lazy=True)
+    storage.load_embeddings()
+    query = np.array([1.0, 0.1])
+    for vectorstore in (storage._vectorstore, None):
+        # FAISS when installed, then the brute-force path
+        storage._vectorstore = vectorstore
+        results = storage.search(query, top_k=2, threshold=0.5, use_mmr=True, lambda_param=0.3)
+        assert [c['id'] for c, _ in results] in (['a', 'b'], ['a2', 'b'])
+
+
+def test_load_embeddings_prefers_int8_copy(storage):
+    from retriever import QuantizedRows
+    rng = np.random.default_rng(1)
+    embs = rng.normal(size=(40, 16)).astype(np.float32)
+    storage.save_chunks([{'id': f'c{i}', 'text': str(i)} for i in range(len(embs))])
+    storage.save_embeddings(embs)
+    storage.save_embeddings_int8(embs)
+    storage.load_chunks()
+    storage.load_embeddings()
+    assert isinstance(storage._embeddings_unit, QuantizedRows)
+    assert storage._embeddings_unit.values.dtype == np.int8
+    storage._vectorstore = None
+    results = storage.search(embs[5], top_k=3, threshold=-1.0)
+    assert results[0][0]['id'] == 'c5'
+    assert abs(results[0][1] - 1.0) < 0.02
+    batch = storage.search_batch(embs[[5, 7]], top_k=1, threshold=-1.0)
+    assert [r[0][0]['id'] for r in batch] == ['c5', 'c7']
+
+
+def test_load_embeddings_rebuilds_faiss_index_for_new_embeddings(storage, tmp_path):
+    pytest.importorskip('faiss')
+    storage.save_chunks([{'id': f'c{i}', 'text': str(i)} for i in range(3)])
+    storage.save_embeddings(np.eye(3, dtype=np.float32))
+    storage.load_chunks()
+    storage.load_embeddings()
+    assert storage._vectorstore.source_hash() is not None
+    # same number of rows, different content, newer file
+    storage.save_embeddings(np.eye(3, dtype=np.float32)[::-1].copy())
+    path = tmp_path / 'embeddings.npy'
+    mtime = os.stat(path).st_mtime + 10
+    os.utime(path, (mtime, mtime))
+    storage.load_embeddings()
+    ids, _ = storage._vectorstore.search(np.array([1.0, 0.0, 0.0]), top_k=1)
+    assert ids == [2]
+
+
+def test_acquire_lock_is_exclusive_and_overrides_stale_lock(storage, tmp_path):
+    lock_path = tmp_path / '.update.lock'
+    storage.acquire_lock()
+    with pytest.raises(RuntimeError):
+        storage.acquire_lock()
+    storage.release_lock()
+    storage.release_lock()
+    # an old lock is taken over
+    with open(lock_path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': '2000-01-01T00:00:00', 'username': 'old'}, f)
+    storage.acquire_lock()
+    with open(lock_path, encoding='utf-8') as f:
+        assert json.load(f)['pid'] == os.getpid()
+    storage.release_lock()
+    with open(lock_path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': '2999-01-01T00:00:00', 'timestamp_epoch': 0.0}, f)
+    storage.acquire_lock()
+    storage.release_lock()
+
+
+def test_stale_lock_takeover_keeps_a_lock_taken_in_between(storage, tmp_path):
+    lock_path = tmp_path / '.update.lock'
+    with open(lock_path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': '2000-01-01T00:00:00', 'timestamp_epoch': 0.0}, f)
+    first, second = storage, Storage(str(tmp_path))
+    # both updaters read the stale lock ...
+    stale = second._read_lock(lock_path)
+    # ... the first one takes it over ...
+    first.acquire_lock()
+    # ... and the second one's takeover must not remove the new lock
+    assert second._claim_stale_lock(lock_path, stale) is False
+    with open(lock_path, encoding='utf-8') as f:
+        assert json.load(f)['pid'] == os.getpid()
+    assert os.listdir(tmp_path) == ['.update.lock']
+    with pytest.raises(RuntimeError):
+        second.acquire_lock()
+    first.release_lock()
+
+
+def test_search_batch_matches_single_searches(storage):
+    rng = np.random.default_rng(2)
+    embs = rng.normal(size=(30, 8)).astype(np.float32)
+    storage.save_chunks([{'id': f'c{i}', 'text': str(i)} for i in range(len(embs))])
+    storage.save_embeddings(embs)
+    storage.load_chunks()
+    storage.load_embeddings()
+    queries = embs[[3, 11, 17]]
+    # FAISS when installed, then the brute-force path
+    for vectorstore in (storage._vectorstore, None):
+        storage._vectorstore = vectorstore
+        batch = storage.search_batch(queries, top_k=3, threshold=-1.0)
+        for query, results in zip(queries, batch):
+            single = storage.search(query, top_k=3, threshold=-1.0)
+            assert [c['id'] for c, _ in results] == [c['id'] for c, _ in single]
+            assert np.allclose([s for _, s in results], [s for _, s in single], atol=1e-5)
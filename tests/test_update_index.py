@@ -0,0 +1,35 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+
+@pytest.fixture
+def update_index(tmp_path, monkeypatch):
+    # the script opens update_index.log in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('update_index')
+
+
+def test_diff_pages_keeps_unchanged_content(update_index):
+    prev = {'A': {'revid': 1, 'content_hash': update_index.content_hash('same')}}
+    pages = [{'title': 'A', 'revid': 2, 'content': 'same'}]
+    state, changed = update_index.diff_pages(pages, prev)
+    assert state['A']['revid'] == 2
+    assert changed == []
+
+
+def test_diff_pages_chunks_every_page_sharing_deleted_content(update_index):
+    # two new pages with the text of a page that was deleted must both be
+    # chunked, not mapped onto the one old title
+    prev = {'Old': {'revid': 1, 'content_hash': update_index.content_hash('text')}}
+    pages = [
+        {'title': 'New1', 'revid': 5, 'content': 'text'},
+        {'title': 'New2', 'revid': 6, 'content': 'text'},
+    ]
+    state, changed = update_index.diff_pages(pages, prev)
+    assert set(state) == {'New1', 'New2'}
+    assert [p['title'] for p in changed] == ['New1', 'New2']
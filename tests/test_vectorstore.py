@@ -0,0 +1,44 @@
+import sys
+import os
+import numpy as np
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+pytest.importorskip('faiss')
+from vectorstore import FaissVectorStore
+
+
+@pytest.mark.parametrize('index_type', ['flat', 'fp16', 'sq8', 'hnsw'])
+def test_faiss_index_types_find_exact_match(tmp_path, index_type):
+    rng = np.random.default_rng(1)
+    embs = rng.normal(size=(200, 16)).astype(np.float32)
+    vs = FaissVectorStore(tmp_path, index_type=index_type)
+    vs.build_index(embs)
+    vs.save()
+    vs.load()
+    ids, scores = vs.search(embs[42], top_k=3)
+    assert ids[0] == 42
+    assert scores[0] == pytest.approx(1.0, abs=0.02)
+
+
+def test_faiss_ivfpq_index(tmp_path):
+    rng = np.random.default_rng(1)
+    embs = rng.normal(size=(10_000, 16)).astype(np.float32)
+    vs = FaissVectorStore(tmp_path, index_type='ivfpq')
+    vs.build_index(embs)
+    vs.save()
+    vs.load()
+    assert vs._index.nlist > 1
+    ids, scores = vs.search(embs[42], top_k=3)
+    assert ids[0] == 42
+
+    # too few vectors to train the code books
+    vs.build_index(embs[:100])
+    ids, scores = vs.search(embs[42], top_k=1)
+    assert ids == [42]
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_faiss_unknown_index_type(tmp_path):
+    with pytest.raises(ValueError):
+        FaissVectorStore(tmp_path, index_type='bogus')